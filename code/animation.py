@@ -0,0 +1,63 @@
+import pygame
+from settings import *
+from support import grid_range
+from collections import OrderedDict
+
+class Animation:
+    def __init__(self, frames, speed):
+        # one clock shared by every tile showing this animation
+        self.frames = frames
+        self.speed = speed
+        self.frame_index = 0
+
+    def update(self, dt):
+        self.frame_index += self.speed * dt
+        if self.frame_index >= len(self.frames):
+            self.frame_index = 0
+
+class AnimatedLayer:
+    def __init__(self, animation, chunk_size=CHUNK_SIZE, cache_size=ANIMATED_CHUNK_CACHE):
+        self.animation = animation
+        self.chunk_size = chunk_size
+
+        # tile positions per chunk, no sprite per tile
+        self.tiles = {}
+
+        # (chunk, frame) -> baked surface, least recently drawn first
+        self.baked = OrderedDict()
+        self.cache_size = cache_size
+
+    def add(self, pos):
+        rect = self.animation.frames[0].get_rect(topleft=pos)
+        for key in grid_range(rect, self.chunk_size):
+            self.tiles.setdefault(key, []).append(pos)
+            self.discard(key)
+
+    def discard(self, key):
+        for frame in range(len(self.animation.frames)):
+            self.baked.pop((key, frame), None)
+
+    def bake(self, key, frame):
+        size = self.chunk_size
+        chunk = pygame.Surface((size, size), pygame.SRCALPHA).convert_alpha()
+        left, top = key[0] * size, key[1] * size
+        surf = self.animation.frames[frame]
+        chunk.blits([(surf, (x - left, y - top)) for x, y in self.tiles[key]], doreturn=False)
+
+        self.baked[(key, frame)] = chunk
+        if len(self.baked) > self.cache_size:
+            self.baked.popitem(last=False)
+        return chunk
+
+    # blits the current frame of the chunks overlapping view (world coordinates) to a RenderTarget
+    def draw(self, target, view):
+        size = self.chunk_size
+        frame = int(self.animation.frame_index)
+        for key in grid_range(view, size):
+            if key in self.tiles:
+                chunk = self.baked.get((key, frame))
+                if chunk is None:
+                    chunk = self.bake(key, frame)
+                else:
+                    self.baked.move_to_end((key, frame))
+                target.blit(chunk, (key[0] * size - view.x, key[1] * size - view.y))
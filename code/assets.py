@@ -0,0 +1,144 @@
+import os
+import pygame
+from time import perf_counter
+from settings import CACHE_DIR
+from mapcache import load_compiled
+from atlas import FOLDER as ATLAS_FOLDER, load_atlas
+
+# everything the level needs, decoded before the first frame
+PRELOAD = [
+    '../data/map.tmx',
+    '../graphics/soil/soil.png',
+    '../graphics/soil/soil_water.png',
+    '../graphics/overlay/hoe.png',
+    '../graphics/overlay/water.png',
+    '../graphics/overlay/tomato.png',
+    '../graphics/water',
+    '../graphics/tomato',
+    '../graphics/rain/drops',
+    '../graphics/rain/floor',
+    '../audio/hoe.wav',
+    '../audio/plant.wav',
+    '../audio/water.wav',
+    '../audio/success.wav',
+] + [f'../graphics/character/{status}' for status in (
+    'up', 'down', 'left', 'right',
+    'up_idle', 'down_idle', 'left_idle', 'right_idle',
+    'up_action', 'down_action', 'left_action', 'right_action')]
+
+# normalised path -> loaded asset, and path -> [load seconds, bytes]
+cache = {}
+stats = {}
+
+def surface_bytes(surf):
+    return surf.get_pitch() * surf.get_height()
+
+def cached(loader):
+    def load(path):
+        key = os.path.normpath(path)
+        if key not in cache:
+            start = perf_counter()
+            asset, size = loader(key)
+            cache[key] = asset
+            stats[key] = [perf_counter() - start, size]
+        return cache[key]
+    return load
+
+@cached
+def load_image(path):
+    surf = pygame.image.load(path).convert_alpha()
+    return surf, surface_bytes(surf)
+
+def load_folder(path):
+    key = os.path.normpath(path)
+    if key in cache:
+        return cache[key]
+
+    surface_list = []
+    for _, _, img_files in os.walk(key):
+        # Sort img_files to ensure correct order
+        img_files.sort(reverse=True)
+        for image in img_files:
+            full_path = key + '/' + image
+            try:
+                # each frame is timed and counted under its own path
+                surface_list.append(load_image(full_path))
+            except pygame.error as e:
+                print(f"Error loading image '{full_path}': {e}")
+
+    cache[key] = surface_list
+    return surface_list
+
+@cached
+def load_sound(path):
+    sound = pygame.mixer.Sound(path)
+    frequency, bits, channels = pygame.mixer.get_init()
+    return sound, round(sound.get_length() * frequency) * channels * abs(bits) // 8
+
+# the compiled map cache; pytmx is only imported when the cache has to be rebuilt
+@cached
+def load_map(path):
+    map_data = load_compiled(path)
+    return map_data, sum(layer.nbytes for layer in map_data.layers.values())
+
+# cuts an image into size x size tiles on disk, once per version of the source, so it
+# can be streamed tile by tile without decoding the whole image; returns (col, row) -> path
+def split_image(path, size):
+    stat = os.stat(path)
+    stamp = f'{stat.st_mtime_ns} {stat.st_size}'
+    name = os.path.splitext(os.path.basename(path))[0]
+    folder = os.path.join(CACHE_DIR, f'{name}_{size}')
+    stamp_path = os.path.join(folder, 'source')
+
+    if not os.path.exists(stamp_path) or open(stamp_path).read() != stamp:
+        os.makedirs(folder, exist_ok=True)
+        image = pygame.image.load(path)
+        bounds = image.get_rect()
+        for col in range(-(-bounds.width // size)):
+            for row in range(-(-bounds.height // size)):
+                area = pygame.Rect(col * size, row * size, size, size).clip(bounds)
+                pygame.image.save(image.subsurface(area), os.path.join(folder, f'{col}_{row}.png'))
+        # written last, so an interrupted split is redone
+        with open(stamp_path, 'w') as file:
+            file.write(stamp)
+
+    tiles = {}
+    for file_name in os.listdir(folder):
+        if file_name.endswith('.png'):
+            col, row = os.path.splitext(file_name)[0].split('_')
+            tiles[int(col), int(row)] = os.path.join(folder, file_name)
+    return tiles
+
+def preload(manifest=PRELOAD):
+    # frames come out of a few packed pages, so the loaders below hit the cache
+    start = perf_counter()
+    pages, frames = load_atlas(manifest)
+    cache.update(frames)
+    stats[ATLAS_FOLDER] = [perf_counter() - start, sum(surface_bytes(page) for page in pages)]
+
+    for path in manifest:
+        if path.endswith('.tmx'):
+            load_map(path)
+        elif path.endswith('.wav'):
+            if pygame.mixer.get_init():
+                load_sound(path)
+        elif os.path.splitext(path)[1]:
+            load_image(path)
+        else:
+            load_folder(path)
+
+def report():
+    lines = []
+    for path, (seconds, size) in sorted(stats.items(), key=lambda item: -item[1][0]):
+        lines.append(f'{seconds * 1000:8.2f} ms {size / 1024:10.1f} KiB  {path}')
+    total_time = sum(seconds for seconds, _ in stats.values())
+    total_size = sum(size for _, size in stats.values())
+    lines.append(f'{total_time * 1000:8.2f} ms {total_size / 1024:10.1f} KiB  total ({len(stats)} assets)')
+    return '\n'.join(lines)
+
+if __name__ == '__main__':
+    os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+    pygame.init()
+    pygame.display.set_mode((1, 1))
+    preload()
+    print(report())
@@ -0,0 +1,84 @@
+import json
+import os
+import pygame
+from settings import ATLAS_SIZE, CACHE_DIR
+
+FOLDER = os.path.join(CACHE_DIR, 'atlas')
+INDEX_PATH = os.path.join(FOLDER, 'index.json')
+
+# image files behind the manifest's images and folders, named the way load_folder names them
+def source_files(manifest):
+    files = []
+    for path in manifest:
+        key = os.path.normpath(path)
+        extension = os.path.splitext(key)[1]
+        if extension == '.png':
+            files.append(key)
+        elif not extension:
+            for _, _, names in os.walk(key):
+                files += [os.path.normpath(key + '/' + name) for name in names if name.endswith('.png')]
+    return files
+
+def stamps(files):
+    return {path: [os.stat(path).st_mtime_ns, os.stat(path).st_size] for path in files}
+
+# shelf packing, tallest first: (page, x, y) for each size, in the order given
+def pack(sizes, page_size, padding=1):
+    order = sorted(range(len(sizes)), key=lambda index: -sizes[index][1])
+    placements = [None] * len(sizes)
+    page = x = y = shelf = 0
+    for index in order:
+        width, height = sizes[index]
+        if x + width > page_size:
+            x, y, shelf = 0, y + shelf + padding, 0
+        if y + height > page_size:
+            page, x, y, shelf = page + 1, 0, 0, 0
+        placements[index] = (page, x, y)
+        x += width + padding
+        shelf = max(shelf, height)
+    return placements
+
+def build(files):
+    # converted first, so colorkeyed images come out with real transparency like load_image gives them
+    images = [pygame.image.load(path).convert_alpha() for path in files]
+    placements = pack([image.get_size() for image in images], ATLAS_SIZE)
+
+    # pages are only as tall as their lowest frame
+    heights = {}
+    for image, (page, x, y) in zip(images, placements):
+        heights[page] = max(heights.get(page, 0), y + image.get_height())
+    pages = [pygame.Surface((ATLAS_SIZE, heights[page]), pygame.SRCALPHA) for page in sorted(heights)]
+    frames = {}
+    for path, image, (page, x, y) in zip(files, images, placements):
+        # MAX onto a cleared page copies pixels exactly, where a normal blit would blend the alpha in
+        pages[page].blit(image, (x, y), special_flags=pygame.BLEND_RGBA_MAX)
+        frames[path] = [page, x, y, image.get_width(), image.get_height()]
+
+    # raw RGBA: a page loads with one read and no PNG decode
+    os.makedirs(FOLDER, exist_ok=True)
+    for number, page in enumerate(pages):
+        with open(os.path.join(FOLDER, f'page_{number}.rgba'), 'wb') as file:
+            file.write(pygame.image.tobytes(page, 'RGBA'))
+    # written last, so an interrupted build is redone
+    with open(INDEX_PATH, 'w') as file:
+        json.dump({'stamps': stamps(files), 'pages': [page.get_size() for page in pages], 'frames': frames}, file)
+
+def load_page(number, size):
+    with open(os.path.join(FOLDER, f'page_{number}.rgba'), 'rb') as file:
+        return pygame.image.frombytes(file.read(), size, 'RGBA').convert_alpha()
+
+# the packed pages, and path -> subsurface view of its frame; rebuilt first if a source changed
+def load_atlas(manifest):
+    files = source_files(manifest)
+    index = None
+    if os.path.exists(INDEX_PATH):
+        with open(INDEX_PATH) as file:
+            index = json.load(file)
+    if index is None or index['stamps'] != stamps(files):
+        build(files)
+        with open(INDEX_PATH) as file:
+            index = json.load(file)
+
+    pages = [load_page(number, size) for number, size in enumerate(index['pages'])]
+    frames = {path: pages[page].subsurface((x, y, width, height)) for path, (page, x, y, width, height) in index['frames'].items()}
+    return pages, frames
@@ -0,0 +1,59 @@
+import pygame
+from itertools import count
+from settings import *
+from assets import load_sound
+
+class Audio:
+    def __init__(self, sounds=SOUNDS, channels=AUDIO_CHANNELS):
+        self.sounds = sounds
+        self.channel_count = channels
+        self.channels = None
+        self.serial = count()
+
+    # the mixer only exists after pygame.init, so channels are claimed on first use
+    def setup(self):
+        pygame.mixer.set_num_channels(self.channel_count)
+        self.channels = [pygame.mixer.Channel(index) for index in range(self.channel_count)]
+        # name, priority and start order of the sound last played on each channel
+        self.voices = [(None, 0, 0)] * self.channel_count
+
+    def pick_channel(self, name, priority, max_voices):
+        busy = [index for index, channel in enumerate(self.channels) if channel.get_busy()]
+
+        # at the voice limit, the oldest copy of this sound restarts
+        same = [index for index in busy if self.voices[index][0] == name]
+        if len(same) >= max_voices:
+            return min(same, key=lambda index: self.voices[index][2])
+
+        for index, channel in enumerate(self.channels):
+            if index not in busy:
+                return index
+
+        # all busy: steal the oldest voice of the lowest priority, if it does not outrank this one
+        index = min(busy, key=lambda index: self.voices[index][1:])
+        if self.voices[index][1] <= priority:
+            return index
+
+    def play(self, name):
+        if not pygame.mixer.get_init():
+            return
+        if self.channels is None:
+            self.setup()
+
+        path, volume, priority, max_voices = self.sounds[name]
+        index = self.pick_channel(name, priority, max_voices)
+        if index is not None:
+            channel = self.channels[index]
+            channel.play(load_sound(path))
+            channel.set_volume(volume)
+            self.voices[index] = (name, priority, next(self.serial))
+
+    # streamed from disk instead of decoded up front
+    def play_music(self, path=MUSIC_PATH, volume=MUSIC_VOLUME):
+        if not pygame.mixer.get_init():
+            return
+        pygame.mixer.music.load(path)
+        pygame.mixer.music.set_volume(volume)
+        pygame.mixer.music.play(loops=-1)
+
+audio = Audio()
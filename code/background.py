@@ -0,0 +1,93 @@
+import pygame
+from settings import *
+from support import grid_range
+from itertools import count
+
+class StaticLayer:
+    def __init__(self, chunk_size=CHUNK_SIZE, max_patches=16):
+        self.chunk_size = chunk_size
+
+        # pieces are [z, serial, surf, rect] lists, filed under every chunk they overlap
+        self.pieces = {}
+        self.chunks = {}
+        self.serial = count()
+
+        # chunks to bake from scratch, and world rects to patch in already baked chunks
+        self.dirty = set()
+        self.dirty_rects = {}
+        self.max_patches = max_patches
+
+    def invalidate(self, key, rect):
+        if key not in self.chunks:
+            self.dirty.add(key)
+        elif key not in self.dirty:
+            rects = self.dirty_rects.setdefault(key, [])
+            rects.append(rect)
+            # past a handful of patches a full rebake is cheaper
+            if len(rects) > self.max_patches:
+                del self.dirty_rects[key]
+                self.dirty.add(key)
+
+    def add(self, surf, pos, z):
+        piece = [z, next(self.serial), surf, surf.get_rect(topleft=pos)]
+        for key in grid_range(piece[3], self.chunk_size):
+            self.pieces.setdefault(key, []).append(piece)
+            self.invalidate(key, piece[3])
+        return piece
+
+    def remove(self, piece):
+        for key in grid_range(piece[3], self.chunk_size):
+            pieces = self.pieces[key]
+            pieces.remove(piece)
+            if pieces:
+                self.invalidate(key, piece[3])
+            else:
+                # nothing left to draw here, so the baked surface goes too
+                del self.pieces[key]
+                self.chunks.pop(key, None)
+                self.dirty.discard(key)
+                self.dirty_rects.pop(key, None)
+
+    def bake(self, key):
+        size = self.chunk_size
+        chunk = self.chunks.get(key)
+        if chunk is None:
+            chunk = pygame.Surface((size, size), pygame.SRCALPHA).convert_alpha()
+            self.chunks[key] = chunk
+        else:
+            chunk.fill((0, 0, 0, 0))
+
+        left, top = key[0] * size, key[1] * size
+        for _, _, surf, rect in sorted(self.pieces[key], key=lambda piece: piece[:2]):
+            chunk.blit(surf, (rect.x - left, rect.y - top))
+        self.dirty.discard(key)
+        self.dirty_rects.pop(key, None)
+
+    # redraws only the given world rects of a baked chunk
+    def patch(self, key):
+        size = self.chunk_size
+        chunk = self.chunks[key]
+        left, top = key[0] * size, key[1] * size
+        pieces = sorted(self.pieces[key], key=lambda piece: piece[:2])
+
+        for rect in self.dirty_rects.pop(key):
+            area = rect.move(-left, -top).clip(chunk.get_rect())
+            chunk.fill((0, 0, 0, 0), area)
+            chunk.set_clip(area)
+            for _, _, surf, piece_rect in pieces:
+                if piece_rect.colliderect(rect):
+                    chunk.blit(surf, (piece_rect.x - left, piece_rect.y - top))
+            chunk.set_clip(None)
+
+    # blits the chunks overlapping view (world coordinates) to a RenderTarget
+    def draw(self, target, view):
+        size = self.chunk_size
+        for key in grid_range(view, size):
+            if key in self.pieces:
+                if key in self.dirty:
+                    self.bake(key)
+                    target.forget(self.chunks[key])
+                elif key in self.dirty_rects:
+                    self.patch(key)
+                    target.forget(self.chunks[key])
+                target.blit(self.chunks[key], (key[0] * size - view.x, key[1] * size - view.y))
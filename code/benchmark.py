@@ -0,0 +1,323 @@
+import json, math, os, shutil, subprocess, sys
+os.environ.setdefault('PYGAME_HIDE_SUPPORT_PROMPT', '1')
+from argparse import ArgumentParser, SUPPRESS
+from random import Random
+from resource import getrusage, RUSAGE_SELF
+from time import perf_counter
+import numpy as np
+import pygame
+from settings import *
+from main import Game
+from profiler import profiler
+from soil import FARMABLE
+
+SEED = 1
+DT = 1 / 60
+# frames run under tracemalloc before counting; free lists and caches take a couple of thousand to settle
+ALLOC_WARMUP = 2400
+# scopes held to --max-alloc-bytes: steady-state drawing, movement and collision
+HOT_SCOPES = ('draw', 'movement', 'collision')
+
+# settings paths are relative to code/; workers run there and the cold start clears this folder,
+# wherever the benchmark was launched from
+CODE_DIR = os.path.dirname(os.path.abspath(__file__))
+CACHE_PATH = os.path.normpath(os.path.join(CODE_DIR, CACHE_DIR))
+TILESETS = os.path.normpath(os.path.join(CODE_DIR, '../data/Tilesets'))
+
+# gids of the tilesets referenced by map.tmx
+WATER_GID = 171
+COLLISION_GID = 170
+FARMABLE_GID = 169
+DECORATION_GIDS = {143: (64, 60), 147: (56, 112), 150: (44, 48), 151: (40, 44), 152: (52, 52)}
+
+SCENARIOS = {}
+
+def scenario(func):
+    SCENARIOS[func.__name__] = func
+    return func
+
+def csv_layer(name, width, height, gid_at):
+    rows = (','.join(str(gid_at(x, y)) for x in range(width)) for y in range(height))
+    data = ',\n'.join(rows)
+    return f' <layer name="{name}" width="{width}" height="{height}" visible="0">\n  <data encoding="csv">\n{data}\n</data>\n </layer>\n'
+
+def generate_map(width, height, decorations=0, farmable=True, seed=SEED):
+    rng = Random(seed)
+    border = lambda x, y: x in (0, width - 1) or y in (0, height - 1)
+
+    objects = []
+    for index in range(decorations):
+        gid = rng.choice(list(DECORATION_GIDS))
+        w, h = DECORATION_GIDS[gid]
+        # tile objects are anchored at their bottom left
+        x = rng.uniform(TILE_SIZE, (width - 2) * TILE_SIZE)
+        y = rng.uniform(2 * TILE_SIZE, (height - 1) * TILE_SIZE)
+        objects.append(f'  <object id="{index + 1}" gid="{gid}" x="{x:.2f}" y="{y:.2f}" width="{w}" height="{h}"/>\n')
+
+    center_x, center_y = width * TILE_SIZE / 2, height * TILE_SIZE / 2
+    tmx = (
+        '<?xml version="1.0" encoding="UTF-8"?>\n'
+        f'<map version="1.8" orientation="orthogonal" renderorder="right-down" width="{width}" height="{height}" '
+        f'tilewidth="{TILE_SIZE}" tileheight="{TILE_SIZE}" infinite="0">\n'
+        f' <tileset firstgid="133" source="{TILESETS}/Plant Decoration.tsx"/>\n'
+        f' <tileset firstgid="143" source="{TILESETS}/Objects.tsx"/>\n'
+        f' <tileset firstgid="169" source="{TILESETS}/interaction.tsx"/>\n'
+        f' <tileset firstgid="171" source="{TILESETS}/Water.tsx"/>\n'
+        + csv_layer('Water', width, height, lambda x, y: WATER_GID)
+        + ' <objectgroup name="Decoration">\n' + ''.join(objects) + ' </objectgroup>\n'
+        + ' <objectgroup name="Player">\n'
+        f'  <object id="{decorations + 1}" name="Start" x="{center_x}" y="{center_y}"><point/></object>\n'
+        f'  <object id="{decorations + 2}" name="Bed" x="{center_x}" y="{center_y - 2 * TILE_SIZE}" width="64" height="64"/>\n'
+        ' </objectgroup>\n'
+        + csv_layer('Collision', width, height, lambda x, y: COLLISION_GID if border(x, y) else 0)
+        + csv_layer('Farmable', width, height, lambda x, y: FARMABLE_GID if farmable and not border(x, y) else 0)
+        + '</map>\n')
+
+    # one file per set of arguments, rewritten only when its text changes so the compiled map
+    # cached against it stays fresh and every run reuses the same cache entry
+    path = os.path.join(CACHE_PATH, 'bench', f'map-{width}x{height}-{decorations}-{int(farmable)}-{seed}.tmx')
+    if os.path.exists(path):
+        with open(path) as file:
+            if file.read() == tmx:
+                return path
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'w') as file:
+        file.write(tmx)
+    return path
+
+# fills the first count farmable tiles, or the whole farm
+def plant_crops(level, count=None, days=2):
+    soil_layer = level.soil_layer
+    for row, col in np.argwhere(soil_layer.grid & FARMABLE)[:count].tolist():
+        pos = (col * TILE_SIZE + TILE_SIZE // 2, row * TILE_SIZE + TILE_SIZE // 2)
+        soil_layer.get_hit(pos)
+        soil_layer.plant_seed(pos, 'tomato')
+
+    # grow them into the main layer so they collide and y-sort, but not ripe enough to harvest
+    for day in range(days):
+        soil_layer.water_all()
+        soil_layer.update_plants()
+        soil_layer.remove_water()
+
+# walks the camera around an ellipse covering most of the map
+def tour(level, frames):
+    rows, cols = level.soil_layer.grid.shape
+    width, height = cols * TILE_SIZE, rows * TILE_SIZE
+    player = level.player
+
+    def hook(frame):
+        angle = 2 * math.pi * frame / frames
+        x = round(width / 2 + width * 0.4 * math.cos(angle))
+        y = round(height / 2 + height * 0.4 * math.sin(angle))
+        player.pos.update(x, y)
+        player.hitbox.center = (x, y)
+        player.rect.center = (x, y)
+        level.all_sprites.mark_dirty(player)
+    return hook
+
+@scenario
+def default(frames):
+    game = Game(headless=True, seed=SEED)
+    return game, tour(game.level, frames)
+
+@scenario
+def crops_1000(frames):
+    game = Game(headless=True, seed=SEED, map_path=generate_map(40, 30))
+    plant_crops(game.level, 1000)
+    return game, tour(game.level, frames)
+
+@scenario
+def crops_10000(frames):
+    game = Game(headless=True, seed=SEED, map_path=generate_map(110, 100))
+    plant_crops(game.level, 10000)
+    return game, tour(game.level, frames)
+
+@scenario
+def heavy_rain(frames):
+    game = Game(headless=True, seed=SEED, rain_rate=RAIN_RATE * 10)
+    game.level.raining = True
+    return game, tour(game.level, frames)
+
+@scenario
+def large_map(frames):
+    game = Game(headless=True, seed=SEED, map_path=generate_map(250, 200, decorations=5000))
+    return game, tour(game.level, frames)
+
+@scenario
+def long_session(frames):
+    game = Game(headless=True, seed=SEED)
+    plant_crops(game.level, days=0)
+    level = game.level
+    walk = tour(level, frames)
+
+    # ends a day every 300 frames; the night transition runs inside the measured frames
+    def hook(frame):
+        if not level.player.sleep:
+            walk(frame)
+            if frame % 300 == 299:
+                level.soil_layer.water_all()
+                level.player.sleep = True
+    return game, hook
+
+def run_scenario(name, frames, allocations=False):
+    start = perf_counter()
+    game, hook = SCENARIOS[name](frames)
+    setup = perf_counter() - start
+
+    # untimed laps under tracemalloc fill every cache and free list, so only steady-state
+    # allocations are counted
+    if allocations:
+        profiler.track_allocations()
+        for frame in range(ALLOC_WARMUP):
+            hook(frame % frames)
+            game.step(DT)
+
+    times = np.empty(frames)
+    for frame in range(frames):
+        hook(frame)
+        start = perf_counter()
+        game.step(DT)
+        times[frame] = perf_counter() - start
+
+    level = game.level
+    frame_ms = times * 1000
+    result = {
+        'frames': frames,
+        'setup_s': round(setup, 3),
+        'frame_ms': {
+            'mean': round(float(frame_ms.mean()), 3),
+            'p50': round(float(np.percentile(frame_ms, 50)), 3),
+            'p95': round(float(np.percentile(frame_ms, 95)), 3),
+            'p99': round(float(np.percentile(frame_ms, 99)), 3),
+            'max': round(float(frame_ms.max()), 3),
+        },
+        'sprites': {
+            'all': len(level.all_sprites),
+            'collision': len(level.collision_sprites),
+            'plants': len(level.soil_layer.plant_sprites),
+            'rain': len(level.rain.rain_floor) + len(level.rain.rain_drops),
+        },
+        # ru_maxrss is in KiB on Linux
+        'peak_rss_kib': getrusage(RUSAGE_SELF).ru_maxrss,
+    }
+    if allocations:
+        result['allocations'] = profiler.allocation_summary(frames)
+    return result
+
+# seconds to a ready Game, including map and asset loading, in this process
+def measure_startup():
+    start = perf_counter()
+    Game(headless=True, seed=SEED)
+    return {'startup_s': round(perf_counter() - start, 3), 'pytmx_imported': 'pytmx' in sys.modules}
+
+# cold starts with no map or ground tile cache on disk, warm starts reuse what the cold one wrote
+def run_startup(runs):
+    results = {}
+    for name in ('cold', 'warm'):
+        samples = []
+        for run in range(runs):
+            if name == 'cold':
+                shutil.rmtree(CACHE_PATH, ignore_errors=True)
+            output = subprocess.run([sys.executable, __file__, '--startup', '--raw'],
+                capture_output=True, text=True, check=True, cwd=CODE_DIR).stdout
+            samples.append(json.loads(output.splitlines()[-1]))
+        seconds = [sample['startup_s'] for sample in samples]
+        results[name] = {'min_s': min(seconds), 'median_s': float(np.median(seconds)), 'pytmx_imported': samples[-1]['pytmx_imported']}
+        print(f"{name:5} startup  min {results[name]['min_s']:6.3f} s  median {results[name]['median_s']:6.3f} s", file=sys.stderr)
+    return {'commit': git_commit(), 'python': sys.version.split()[0], 'startup': results}
+
+def git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True).stdout.strip()
+    except OSError:
+        return None
+
+# runs every scenario in a fresh process so peak memory is per scenario
+def run_all(names, frames, allocations=False):
+    results = {}
+    for name in names:
+        output = subprocess.run(
+            [sys.executable, __file__, '--scenario', name, '--frames', str(frames), '--raw'] + ['--alloc'] * allocations,
+            capture_output=True, text=True, check=True, cwd=CODE_DIR).stdout
+        results[name] = json.loads(output.splitlines()[-1])
+        if allocations:
+            summary = results[name]['allocations']
+            print(f"{name:14} {summary['allocated_bytes']:10.1f} B/frame  {summary['collections']:4d} collections", file=sys.stderr)
+        else:
+            print(f"{name:14} p50 {results[name]['frame_ms']['p50']:8.3f} ms  p95 {results[name]['frame_ms']['p95']:8.3f} ms  "
+                  f"p99 {results[name]['frame_ms']['p99']:8.3f} ms", file=sys.stderr)
+    return {
+        'commit': git_commit(),
+        'python': sys.version.split()[0],
+        'pygame': pygame.version.ver,
+        'dt': DT,
+        'scenarios': results,
+    }
+
+# hot scopes whose mean per-frame high-water mark went over limit; a per-sprite allocation
+# shows up here long before it shows in the frame's net bytes
+def check_allocations(report, limit):
+    failures = []
+    for name, result in report['scenarios'].items():
+        for scope in HOT_SCOPES:
+            stats = result['allocations']['scopes'].get(scope)
+            if stats and stats['peak_bytes'] > limit:
+                print(f"{name:14} {scope:10} peak {stats['peak_bytes']:10.1f} B > {limit} B", file=sys.stderr)
+                failures.append(f'{name}/{scope}')
+    return failures
+
+# p95 frame times that grew by more than tolerance against a previous report
+def compare(report, baseline, tolerance):
+    regressions = []
+    for name, result in report['scenarios'].items():
+        old = baseline['scenarios'].get(name)
+        if old:
+            before, after = old['frame_ms']['p95'], result['frame_ms']['p95']
+            change = (after - before) / before if before else 0
+            print(f'{name:14} p95 {before:8.3f} -> {after:8.3f} ms ({change:+.0%})', file=sys.stderr)
+            if change > tolerance:
+                regressions.append(name)
+    return regressions
+
+if __name__ == '__main__':
+    parser = ArgumentParser(description='Frame-time benchmarks on synthetic scenarios')
+    parser.add_argument('--scenario', action='append', choices=sorted(SCENARIOS), help='run only these scenarios')
+    parser.add_argument('--frames', type=int, default=600, help='measured frames per scenario')
+    parser.add_argument('--output', help='write the JSON report here instead of stdout')
+    parser.add_argument('--compare', help='previous JSON report to check for p95 regressions')
+    parser.add_argument('--tolerance', type=float, default=0.15, help='allowed p95 slowdown before failing')
+    parser.add_argument('--startup', action='store_true', help='measure cold and warm startup instead of frame times')
+    parser.add_argument('--runs', type=int, default=5, help='startups measured per cache state')
+    parser.add_argument('--alloc', action='store_true', help='count steady-state allocations per frame and scope (slows frame times)')
+    parser.add_argument('--max-alloc-bytes', type=int, metavar='BYTES',
+        help=f"with --alloc, fail if {', '.join(HOT_SCOPES)} hold more than this per frame")
+    parser.add_argument('--raw', action='store_true', help=SUPPRESS)
+    args = parser.parse_args()
+    if args.max_alloc_bytes is not None:
+        args.alloc = True
+
+    # worker mode: one scenario or startup in this process, one JSON line out
+    if args.raw:
+        print(json.dumps(measure_startup() if args.startup else run_scenario(args.scenario[0], args.frames, args.alloc)))
+        sys.exit()
+
+    report = run_startup(args.runs) if args.startup else run_all(args.scenario or list(SCENARIOS), args.frames, args.alloc)
+    if args.output:
+        with open(args.output, 'w') as file:
+            json.dump(report, file, indent=2)
+    else:
+        print(json.dumps(report, indent=2))
+
+    # traced frame times say nothing about speed
+    if args.compare and not (args.startup or args.alloc):
+        with open(args.compare) as file:
+            regressions = compare(report, json.load(file), args.tolerance)
+        if regressions:
+            print('slower p95: ' + ', '.join(regressions), file=sys.stderr)
+            sys.exit(1)
+
+    if args.max_alloc_bytes is not None and not args.startup:
+        failures = check_allocations(report, args.max_alloc_bytes)
+        if failures:
+            print('over the allocation limit: ' + ', '.join(failures), file=sys.stderr)
+            sys.exit(1)
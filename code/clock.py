@@ -0,0 +1,22 @@
+import pygame
+
+class SimulationClock:
+    # stands in for pygame.time when the game is stepped by hand
+    def __init__(self):
+        self.ticks = 0.0
+
+    def advance(self, dt):
+        self.ticks += dt * 1000
+
+    def get_ticks(self):
+        return int(self.ticks)
+
+# milliseconds source for the timer scheduler, swapped for a simulation clock by Game
+source = pygame.time
+
+def get_ticks():
+    return source.get_ticks()
+
+def use(clock):
+    global source
+    source = clock
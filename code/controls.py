@@ -0,0 +1,96 @@
+import pygame
+from random import getrandbits
+from struct import Struct
+
+# action bits read by Player.input
+UP = 1
+DOWN = 2
+LEFT = 4
+RIGHT = 8
+USE = 16
+SWITCH = 32
+SLEEP = 64
+
+# log layout: header with the level seed, then one (dt in microseconds, actions) record per frame
+MAGIC = b'SKIR'
+VERSION = 1
+HEADER = Struct('<4sBq')
+FRAME = Struct('<IB')
+
+class Controls:
+    finished = False
+
+    # live keyboard and mouse, sampled once per frame
+    def __init__(self):
+        self.actions = 0
+
+    def read(self):
+        keys = pygame.key.get_pressed()
+        mouse_buttons = pygame.mouse.get_pressed()
+
+        actions = 0
+        if keys[pygame.K_UP] or keys[pygame.K_w]:
+            actions |= UP
+        if keys[pygame.K_DOWN] or keys[pygame.K_s]:
+            actions |= DOWN
+        if keys[pygame.K_LEFT] or keys[pygame.K_a]:
+            actions |= LEFT
+        if keys[pygame.K_RIGHT] or keys[pygame.K_d]:
+            actions |= RIGHT
+        if mouse_buttons[0]:
+            actions |= USE
+        if keys[pygame.K_TAB]:
+            actions |= SWITCH
+        if keys[pygame.K_SPACE]:
+            actions |= SLEEP
+        return actions
+
+    # called by the game loop before the level runs; returns the dt to simulate
+    def update(self, dt):
+        self.actions = self.read()
+        return dt
+
+    def close(self):
+        pass
+
+class InputRecorder(Controls):
+    def __init__(self, path, seed=None):
+        super().__init__()
+        self.seed = getrandbits(63) if seed is None else seed
+        self.file = open(path, 'wb')
+        self.file.write(HEADER.pack(MAGIC, VERSION, self.seed))
+
+    def update(self, dt):
+        self.actions = self.read()
+        micros = round(dt * 1_000_000)
+        self.file.write(FRAME.pack(micros, self.actions))
+        # replay steps with the stored dt, so the recording session does too
+        return micros / 1_000_000
+
+    def close(self):
+        self.file.close()
+
+class InputReplay(Controls):
+    def __init__(self, path):
+        super().__init__()
+        with open(path, 'rb') as file:
+            data = file.read()
+
+        magic, version, self.seed = HEADER.unpack_from(data)
+        if magic != MAGIC or version != VERSION:
+            raise ValueError(f"'{path}' is not a version {VERSION} input recording")
+
+        # a session that crashed mid-write leaves a partial last frame
+        body = data[HEADER.size:]
+        body = body[:len(body) - len(body) % FRAME.size]
+        self.frames = list(FRAME.iter_unpack(body))
+        self.index = 0
+
+    @property
+    def finished(self):
+        return self.index >= len(self.frames)
+
+    def update(self, dt):
+        micros, self.actions = self.frames[self.index]
+        self.index += 1
+        return micros / 1_000_000
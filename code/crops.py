@@ -0,0 +1,65 @@
+import numpy as np
+from settings import *
+
+class CropField:
+    # every crop as a row of parallel columns; sprites only mirror what is visible
+    def __init__(self, crop_types, max_ages, capacity=64):
+        self.crop_types = list(crop_types)
+        self.speeds = np.array([GROW_SPEED[crop_type] for crop_type in self.crop_types], np.float64)
+        self.max_ages = np.array([max_ages[crop_type] for crop_type in self.crop_types], np.float64)
+
+        self.row = np.zeros(capacity, np.intp)
+        self.col = np.zeros(capacity, np.intp)
+        self.kind = np.zeros(capacity, np.uint8)
+        self.age = np.zeros(capacity, np.float64)
+        self.speed = np.zeros(capacity, np.float64)
+        self.max_age = np.zeros(capacity, np.float64)
+        self.harvestable = np.zeros(capacity, bool)
+        self.alive = np.zeros(capacity, bool)
+        self.free = list(range(capacity - 1, -1, -1))
+
+    def __len__(self):
+        return int(np.count_nonzero(self.alive))
+
+    def grow_columns(self):
+        capacity = len(self.alive)
+        for name in ('row', 'col', 'kind', 'age', 'speed', 'max_age', 'harvestable', 'alive'):
+            column = getattr(self, name)
+            setattr(self, name, np.concatenate((column, np.zeros_like(column))))
+        self.free = list(range(2 * capacity - 1, capacity - 1, -1))
+
+    def add(self, cell, crop_type, age=0):
+        if not self.free:
+            self.grow_columns()
+        index = self.free.pop()
+        kind = self.crop_types.index(crop_type)
+        self.row[index], self.col[index] = cell
+        self.kind[index] = kind
+        self.speed[index] = self.speeds[kind]
+        self.max_age[index] = self.max_ages[kind]
+        self.age[index] = min(age, self.max_age[index])
+        self.harvestable[index] = self.age[index] >= self.max_age[index]
+        self.alive[index] = True
+        return index
+
+    def remove(self, index):
+        self.alive[index] = False
+        self.harvestable[index] = False
+        self.free.append(index)
+
+    def live(self):
+        return np.flatnonzero(self.alive)
+
+    # grows every crop on a watered tile by days in one step, since
+    # min(age + speed * days, max_age) is the same as growing one day at a time;
+    # returns the crops whose growth stage changed
+    def advance(self, watered, days=1):
+        live = self.live()
+        age = self.age[live]
+        stage = age.astype(np.intp)
+
+        grows = watered[self.row[live], self.col[live]]
+        age = np.minimum(age + self.speed[live] * days * grows, self.max_age[live])
+        self.age[live] = age
+        self.harvestable[live] = age >= self.max_age[live]
+        return live[age.astype(np.intp) != stage]
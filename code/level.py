@@ -2,63 +2,98 @@ import pygame
 from settings import *
 from player import Player
 from overlay import Overlay
-from sprites import Generic, Water, WildFlower, Interaction, Particle
+from sprites import Interaction, Particle
 from support import *
 from transition import Transition
-from pytmx.util_pygame import load_pygame
+from assets import load_map
 from soil import SoilLayer
+from spatial import CollisionGroup
+from background import StaticLayer
+from animation import Animation, AnimatedLayer
 from sky import Rain, Sky
-from random import randint
+from lighting import Lighting
+from random import Random
+import numpy as np
+from operator import attrgetter
+from bisect import bisect_left, bisect_right
+from itertools import islice
+from profiler import profiler
+from controls import Controls
+from save import SaveFile
+from audio import audio
+from world import WorldStreamer
+from render import RenderTarget
+from time import perf_counter
+from timer import scheduler
 
 class Level:
-	def __init__(self):
-		# get the display surface
+	def __init__(self, rng=None, render=True, map_path=MAP_PATH, rain_rate=RAIN_RATE, controls=None, save_path=None,
+			render_scale=RENDER_SCALE, dynamic_scale=DYNAMIC_SCALE):
+		# get the display surface, and the possibly smaller one the world is drawn to
 		self.display_surface = pygame.display.get_surface()
+		self.target = RenderTarget(render_scale, dynamic_scale)
+
+		# pass a seeded Random for repeatable runs; render=False skips all drawing
+		self.rng = rng or Random()
+		self.render = render
+		self.map_path = map_path
+		self.controls = controls or Controls()
 
 		# sprite groups
 		self.all_sprites = CameraGroup()
-		self.collision_sprites = pygame.sprite.Group()
+		self.collision_sprites = CollisionGroup()
 		self.tree_sprites = pygame.sprite.Group()
 		self.interaction_sprites = pygame.sprite.Group()
 
-		self.soil_layer = SoilLayer(self.all_sprites, self.collision_sprites)
+		# ground, soil and wet soil baked into chunks
+		self.background = StaticLayer()
+		self.all_sprites.batch_layers[LAYERS['ground']] = self.background
+
+		self.soil_layer = SoilLayer(self.all_sprites, self.collision_sprites, self.background, map_path)
 		self.setup()
 		self.overlay = Overlay(self.player)
 		self.transition = Transition(self.reset, self.player)
 
 		# sky
-		self.rain = Rain(self.all_sprites)
-		self.raining = randint(0,10) > 5
+		self.rain = Rain(self.all_sprites, self.map_size, np.random.default_rng(self.rng.getrandbits(64)), rain_rate)
+		self.raining = self.rng.randint(0,10) > 5
 		self.soil_layer.raining = self.raining
 		self.sky = Sky()
+		self.lighting = Lighting()
+
+		# farm state, loaded now and autosaved at the end of every day
+		self.save_file = SaveFile(save_path) if save_path else None
+		if self.save_file and self.save_file.exists():
+			self.load(self.save_file.load())
 
 		# music
-		self.success = pygame.mixer.Sound('../audio/success.wav')
-		self.success.set_volume(0.5)
-		self.music = pygame.mixer.Sound('../audio/music.mp3')
-		self.music.play(loops=-1)
-		self.music.set_volume(0.5)
+		audio.play_music()
 
 
 	def setup(self):
 		# Map objects setup
-		tmx_data = load_pygame('../data/map.tmx')
+		map_data = load_map(self.map_path)
+		self.map_size = (map_data.width * TILE_SIZE, map_data.height * TILE_SIZE)
 
 		# Water
-		water_frames = import_folder('../graphics/water')
-		for x, y, surf in tmx_data.get_layer_by_name('Water').tiles():
-			Water((x * TILE_SIZE, y * TILE_SIZE), water_frames, self.all_sprites)
+		water_animation = Animation(import_folder('../graphics/water'), 5)
+		self.water = AnimatedLayer(water_animation)
+		for x, y in map_data.tiles('Water'):
+			self.water.add((x * TILE_SIZE, y * TILE_SIZE))
+		self.all_sprites.batch_layers[LAYERS['water']] = self.water
+		self.all_sprites.animations.append(water_animation)
 
-		# Grass decorations
-		for obj in tmx_data.get_layer_by_name('Decoration'):
-			WildFlower((obj.x, obj.y), obj.image, [self.all_sprites, self.collision_sprites])
+		# walls, merged into as few plain rects as possible when the map was compiled
+		self.collision_sprites.add_rects(
+			pygame.Rect(x * TILE_SIZE, y * TILE_SIZE, width * TILE_SIZE, height * TILE_SIZE)
+			for x, y, width, height in map_data.rects['Collision'])
 
-		# Collision tiles
-		for x,y,surf in tmx_data.get_layer_by_name('Collision').tiles():
-			Generic((x * TILE_SIZE, y * TILE_SIZE), pygame.Surface((TILE_SIZE, TILE_SIZE)), self.collision_sprites)
+		# ground and grass decorations, loaded in chunks around the player
+		self.world = WorldStreamer(map_data, self.background, self.all_sprites, self.collision_sprites,
+			GROUND_PATH if self.render else None)
 
 		# Player setup
-		for obj in tmx_data.get_layer_by_name('Player'):
+		for obj in map_data.objects['Player']:
 			if obj.name == 'Start':
 				self.player = Player(
 					pos = (obj.x, obj.y),
@@ -66,20 +101,17 @@ class Level:
 					collision_sprites = self.collision_sprites,
 					tree_sprites = self.tree_sprites,
 					interaction = self.interaction_sprites,
-					soil_layer = self.soil_layer)
+					soil_layer = self.soil_layer,
+					controls = self.controls)
 
 			if obj.name == 'Bed':
 				Interaction((obj.x, obj.y), (obj.width, obj.height), self.interaction_sprites, obj.name)
 
-		Generic(
-			pos = (0,0),
-			surf = pygame.image.load("../graphics/world/ground.png").convert_alpha(),
-			groups = self.all_sprites,
-			z = LAYERS['ground'])
+		self.world.update(self.player.rect.center)
 
 	def player_add(self, item):
 		self.player.item_inventory[item] += 1
-		self.success.play()
+		audio.play('success')
 
 	def reset(self):
 		# plants
@@ -88,7 +120,7 @@ class Level:
 		# soil
 		self.soil_layer.remove_water()
 		# randomize the rain
-		self.raining = randint(0, 10) > 7
+		self.raining = self.rng.randint(0, 10) > 7
 		self.soil_layer.raining = self.raining
 		if self.raining:
 			self.soil_layer.water_all()
@@ -96,50 +128,248 @@ class Level:
 		# reset daylight
 		self.sky.start_color = [255,255,255]
 
+		# autosave
+		if self.save_file:
+			self.save_file.save(self.snapshot())
+
+	def snapshot(self):
+		state = self.soil_layer.snapshot()
+		state['item_inventory'] = dict(self.player.item_inventory)
+		state['seed_inventory'] = dict(self.player.seed_inventory)
+		state['raining'] = self.raining
+		return state
+
+	def load(self, state):
+		# a save from a different map no longer lines up with the farm
+		if state['grid'].shape != self.soil_layer.grid.shape:
+			return
+		self.soil_layer.restore(state)
+		self.player.item_inventory.update(state['item_inventory'])
+		self.player.seed_inventory.update(state['seed_inventory'])
+		self.raining = self.soil_layer.raining = state['raining']
+
 	def plant_collision(self):
-		if self.soil_layer.plant_sprites:
-			for plant in self.soil_layer.plant_sprites.sprites():
-				if plant.harvestable and plant.rect.colliderect(self.player.hitbox):
-					self.player_add(plant.plant_type)
-					plant.kill()
-					Particle(plant.rect.topleft, plant.image, self.all_sprites, z=LAYERS['main'])
-					self.soil_layer.grid[plant.rect.centery // TILE_SIZE][plant.rect.centerx // TILE_SIZE].remove('P')
-
-	def run(self,dt):
-		# drawing
-		self.display_surface.fill('black')
-		self.all_sprites.custom_draw(self.player)
-		self.all_sprites.update(dt)
-		self.plant_collision()
-
-		# weather
-		self.overlay.display()
+		# only the few tiles around the player are checked, however big the farm
+		for plant in self.soil_layer.ripe_plants(self.player.hitbox):
+			if plant.harvestable and plant.rect.colliderect(self.player.hitbox):
+				self.player_add(plant.plant_type)
+				plant.kill()
+				Particle(plant.rect.topleft, plant.image, self.all_sprites, z=LAYERS['main'])
+				self.soil_layer.remove_plant(plant)
+
+	# one fixed tick of game logic
+	def update(self, dt):
+		with profiler.scope('streaming'):
+			self.world.update(self.player.rect.center)
+		with profiler.scope('update'):
+			self.all_sprites.update(dt)
+		with profiler.scope('plant collision'):
+			self.plant_collision()
 
 		# rain
 		if self.raining:
-			self.rain.update()
+			with profiler.scope('rain'):
+				self.rain.update(dt)
 
 		# daytime
-		self.sky.display(dt)
+		with profiler.scope('sky'):
+			self.sky.update(dt)
 
 		# transition overlay
 		if self.player.sleep:
-			self.transition.play()
+			with profiler.scope('transition'):
+				self.transition.update()
+
+		# timers and sprite lifetimes that ran out this tick
+		with profiler.scope('timers'):
+			scheduler.update()
+
+	# alpha is how far the frame sits between the last tick and the next
+	def draw(self, alpha=1):
+		if self.render:
+			start = perf_counter()
+			with profiler.scope('draw'):
+				self.target.surface.fill('black')
+				# the camera follows the interpolated player
+				center = self.player.rect.center
+				self.player.rect.center = self.player.interpolate(alpha)
+				self.all_sprites.custom_draw(self.player, self.target)
+				self.player.rect.center = center
+
+			# day tint and sleep fade in one pass, at the render scale
+			with profiler.scope('lighting'):
+				if self.player.sleep:
+					self.lighting.draw(self.target.surface, self.sky.start_color, self.transition.tint)
+				else:
+					self.lighting.draw(self.target.surface, self.sky.start_color)
+
+			# world up to the display, then the HUD on top at full resolution
+			with profiler.scope('present'):
+				self.target.present()
+			self.target.adapt(perf_counter() - start)
+
+			# weather
+			with profiler.scope('overlay'):
+				self.overlay.display()
+
+		# profiler graph
+		if profiler.enabled:
+			rain = len(self.rain.rain_floor) + len(self.rain.rain_drops)
+			profiler.end_frame(len(self.all_sprites), len(self.soil_layer.plant_sprites), rain)
+			if self.render and profiler.visible:
+				profiler.display(self.display_surface)
+
+	def run(self, dt):
+		self.update(dt)
+		self.draw()
+
+sort_key = attrgetter('rect.centery')
+rect_key = attrgetter('rect')
 
 class CameraGroup(pygame.sprite.Group):
 	def __init__(self):
 		super().__init__()
-		self.display_surface = pygame.display.get_surface()
 		self.offset = pygame.math.Vector2()
+		self.view = pygame.Rect(0, 0, SCREEN_WIDTH, SCREEN_HEIGHT)
+
+		# per-layer buckets, each kept sorted by centery
+		self.layers = {layer: [] for layer in LAYERS.values()}
+		self.layer_rects = {layer: [] for layer in LAYERS.values()}
+		# tallest rect per layer, bounding how far a centery can sit from the view and still show
+		self.layer_reach = {layer: 0 for layer in LAYERS.values()}
+		self.sprite_layers = {}
+		self.dirty_layers = set()
 
-	# updates camera as player moves
-	def custom_draw(self, player):
+		# layers drawn in one batch instead of per sprite, keyed by z
+		self.batch_layers = {}
+
+		# shared clocks for animated and particle layers
+		self.animations = []
+
+		# sprites join groups before their z is set, so bucket them on the next draw
+		self.pending = []
+
+		# sprites that moved within their layer, slotted back in place instead of re-sorting it
+		self.moved = {}
+
+		# sprites with an update of their own; the rest cost nothing per tick
+		self.updaters = ()
+
+	def add_internal(self, sprite, layer=None):
+		super().add_internal(sprite)
+		self.pending.append(sprite)
+		if type(sprite).update is not pygame.sprite.Sprite.update:
+			self.updaters += (sprite,)
+
+	def remove_internal(self, sprite):
+		super().remove_internal(sprite)
+		layer = self.sprite_layers.pop(sprite, None)
+		if layer is None:
+			self.pending.remove(sprite)
+		else:
+			self.layers[layer].remove(sprite)
+			self.dirty_layers.add(layer)
+			self.moved.pop(sprite, None)
+		if sprite in self.updaters:
+			self.updaters = tuple(updater for updater in self.updaters if updater is not sprite)
+
+	# a tuple is swapped rather than changed, so sprites may leave the group while it is walked
+	def update(self, dt):
+		for animation in self.animations:
+			animation.update(dt)
+		for sprite in self.updaters:
+			sprite.update(dt)
+
+	# call when a sprite moved, swapped its rect or changed its z
+	def mark_dirty(self, sprite):
+		layer = self.sprite_layers.get(sprite)
+		if layer is None:
+			return
+
+		if layer != sprite.z:
+			self.layers[layer].remove(sprite)
+			self.dirty_layers.add(layer)
+			self.layers.setdefault(sprite.z, []).append(sprite)
+			self.sprite_layers[sprite] = sprite.z
+			self.dirty_layers.add(sprite.z)
+		elif layer not in self.dirty_layers:
+			self.moved[sprite] = None
+
+	# takes the moved sprites out of a layer, then slots each back into what is left, which is sorted
+	def reposition(self, moved, layer):
+		sprites = self.layers[layer]
+		rects = self.layer_rects[layer]
+		for sprite in moved:
+			index = sprites.index(sprite)
+			del sprites[index]
+			del rects[index]
+		for sprite in moved:
+			index = bisect_right(sprites, sprite.rect.centery, key = sort_key)
+			sprites.insert(index, sprite)
+			rects.insert(index, sprite.rect)
+			self.layer_reach[layer] = max(self.layer_reach[layer], sprite.rect.height)
+
+	def sort_layers(self):
+		for sprite in self.pending:
+			self.sprite_layers[sprite] = sprite.z
+			self.layers.setdefault(sprite.z, []).append(sprite)
+			self.dirty_layers.add(sprite.z)
+		self.pending.clear()
+
+		# past a handful of moved sprites, each O(n) reposition costs more than one sort
+		moved_layers = {}
+		for sprite in self.moved:
+			moved_layers.setdefault(self.sprite_layers[sprite], []).append(sprite)
+		for layer, moved in moved_layers.items():
+			if len(moved) > RESORT_MOVED:
+				self.dirty_layers.add(layer)
+
+		for layer in self.dirty_layers:
+			sprites = self.layers[layer]
+			sprites.sort(key = sort_key)
+			self.layer_rects[layer] = list(map(rect_key, sprites))
+			self.layer_reach[layer] = max((rect.height for rect in self.layer_rects[layer]), default = 0)
+
+		# layers sorted whole above already hold their moved sprites in place
+		for layer, moved in moved_layers.items():
+			if layer not in self.dirty_layers:
+				self.reposition(moved, layer)
+		self.moved.clear()
+		self.dirty_layers.clear()
+
+	# updates camera as player moves; the view stays in world pixels and only the blits are scaled
+	def custom_draw(self, player, target):
 		self.offset.x = player.rect.centerx - SCREEN_WIDTH / 2
 		self.offset.y = player.rect.centery - SCREEN_HEIGHT / 2
+		offset_x, offset_y = int(self.offset.x), int(self.offset.y)
+		self.view.topleft = (offset_x, offset_y)
 
+		if self.pending or self.dirty_layers or self.moved:
+			self.sort_layers()
+
+		# only sprites overlapping the view get blitted, in one blits() call per layer
+		# that hands back no rects
+		blits = target.surface.blits
+		image = target.image
+		scale = target.scale
+		view = self.view
+		colliderect = view.colliderect
 		for layer in LAYERS.values():
-			for sprite in sorted(self.sprites(), key = lambda sprite: sprite.rect.centery):
-				if sprite.z == layer:
-					offset_rect = sprite.rect.copy()
-					offset_rect.center -= self.offset
-					self.display_surface.blit(sprite.image, offset_rect)
\ No newline at end of file
+			batch_layer = self.batch_layers.get(layer)
+			if batch_layer is not None:
+				batch_layer.draw(target, view)
+
+			sprites = self.layers.get(layer)
+			if sprites:
+				# a layer is sorted by centery, so only a band of it can reach the view; walking
+				# that band builds no index list, however many sprites are visible
+				reach = self.layer_reach[layer]
+				rects = self.layer_rects[layer]
+				start = bisect_left(sprites, view.top - reach, key = sort_key)
+				end = bisect_right(sprites, view.bottom + reach, start, key = sort_key)
+				visible = (sprite for sprite, rect in zip(islice(sprites, start, end), islice(rects, start, end)) if colliderect(rect))
+				if scale == 1:
+					blits(((sprite.image, (sprite.rect.x - offset_x, sprite.rect.y - offset_y)) for sprite in visible), doreturn = False)
+				else:
+					blits(((image(sprite.image), (round((sprite.rect.x - offset_x) * scale), round((sprite.rect.y - offset_y) * scale)))
+						for sprite in visible), doreturn = False)
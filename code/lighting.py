@@ -0,0 +1,32 @@
+import pygame
+from settings import *
+
+class Lighting:
+    def __init__(self, step=LIGHT_STEP):
+        self.tint_surf = pygame.Surface((SCREEN_WIDTH, SCREEN_HEIGHT))
+        self.step = step
+
+        # color currently filled into tint_surf
+        self.color = None
+
+    # multiplies the tints together, rounding toward white in steps
+    def combine(self, tints):
+        color = [255, 255, 255]
+        for tint in tints:
+            for index, value in enumerate(tint):
+                color[index] = color[index] * value / 255
+        return tuple(255 - (255 - int(value)) // self.step * self.step for value in color)
+
+    # one multiply pass over surface for every tint, skipped entirely in full daylight
+    def draw(self, surface, *tints):
+        color = self.combine(tints)
+        if color == (255, 255, 255):
+            return
+        # the render scale can change the surface size between frames
+        if self.tint_surf.get_size() != surface.get_size():
+            self.tint_surf = pygame.Surface(surface.get_size())
+            self.color = None
+        if color != self.color:
+            self.tint_surf.fill(color)
+            self.color = color
+        surface.blit(self.tint_surf, (0, 0), special_flags=pygame.BLEND_RGB_MULT)
@@ -0,0 +1,42 @@
+from time import perf_counter, sleep
+from settings import *
+
+class Loop:
+    # fixed simulation ticks, with rendering paced separately by an optional fps cap
+    def __init__(self, tick_rate=TICK_RATE, fps_cap=FPS_CAP):
+        self.dt = 1 / tick_rate
+        self.frame_time = 1 / fps_cap if fps_cap else 0
+        self.accumulator = 0
+        self.last = perf_counter()
+        self.deadline = self.last
+
+    # how many ticks the time since the last call pays for
+    def ticks(self):
+        now = perf_counter()
+        # after a stall, drop the backlog instead of simulating it all at once
+        self.accumulator += min(now - self.last, MAX_FRAME_TIME)
+        self.last = now
+
+        count = int(self.accumulator / self.dt)
+        self.accumulator -= count * self.dt
+        return count
+
+    # how far the next frame sits between the last tick and the one after it
+    @property
+    def alpha(self):
+        return self.accumulator / self.dt
+
+    # sleeps off the rest of the frame, then yields for the last stretch sleep() can't hit
+    def wait(self):
+        if not self.frame_time:
+            return
+        self.deadline += self.frame_time
+        remaining = self.deadline - perf_counter()
+        if remaining < 0:
+            # running behind, so pace from now rather than trying to catch up
+            self.deadline = perf_counter()
+            return
+        if remaining > SLEEP_MARGIN:
+            sleep(remaining - SLEEP_MARGIN)
+        while perf_counter() < self.deadline:
+            sleep(0)
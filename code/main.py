@@ -1,26 +1,171 @@
-import pygame, sys
+import pygame, sys, os
+from argparse import ArgumentParser
+from random import Random
+from time import perf_counter
 from settings import *
 from level import Level
+from assets import preload
+from profiler import profiler
+from controls import Controls, InputRecorder, InputReplay
+from loop import Loop
+import clock
+import gc
+from timer import scheduler
 
 class Game:
-	def __init__(self):
+	def __init__(self, headless=False, seed=None, render=True, record=None, replay=None,
+			tick_rate=TICK_RATE, fps_cap=FPS_CAP, vsync=VSYNC, **level_options):
+		# input is live, logged to a file, or read back from one; a log carries its level seed
+		if replay:
+			self.controls = InputReplay(replay)
+			seed = self.controls.seed
+		elif record:
+			self.controls = InputRecorder(record, seed)
+			seed = self.controls.seed
+		else:
+			self.controls = Controls()
+
+		# headless runs use SDL's dummy drivers
+		self.headless = headless
+		if headless:
+			os.environ['SDL_VIDEODRIVER'] = 'dummy'
+			os.environ['SDL_AUDIODRIVER'] = 'dummy'
+
+		# timers run on simulated time, so they expire on the same tick on every machine and in replays
+		self.sim_clock = clock.SimulationClock()
+		clock.use(self.sim_clock)
+		# anything still scheduled was timed against the old clock
+		scheduler.clear()
+
 		pygame.init()
-		self.screen = pygame.display.set_mode((SCREEN_WIDTH,SCREEN_HEIGHT))
+		self.screen = self.create_screen(vsync and not headless)
 		pygame.display.set_caption('Stardew Knockoff')
-		self.clock = pygame.time.Clock()
-		self.level = Level()
+		preload()
+		rng = Random(seed) if seed is not None else None
+		self.level = Level(rng, render, controls = self.controls, **level_options)
+		self.loop = Loop(tick_rate, fps_cap)
+
+		# the level's long-lived objects leave the collector's view, so full collections in a
+		# long session stop walking every sprite and asset
+		gc.collect()
+		gc.freeze()
+
+	# vsync needs a renderer-backed window, which SCALED provides
+	def create_screen(self, vsync):
+		if vsync:
+			try:
+				return pygame.display.set_mode((SCREEN_WIDTH,SCREEN_HEIGHT), pygame.SCALED, vsync = 1)
+			except pygame.error:
+				pass
+		return pygame.display.set_mode((SCREEN_WIDTH,SCREEN_HEIGHT))
+
+	def quit(self):
+		self.controls.close()
+		if self.level.save_file:
+			self.level.save_file.wait()
+		pygame.quit()
+		sys.exit()
 
 	def run(self):
 		while True:
 			for event in pygame.event.get():
 				if event.type == pygame.QUIT:
-					pygame.quit()
-					sys.exit()
+					self.quit()
 
-			dt = self.clock.tick() / 1000
-			self.level.run(dt)
+				# F3 toggles the profiler graph, F4 writes what it has recorded
+				if event.type == pygame.KEYDOWN and event.key == pygame.K_F3:
+					profiler.toggle()
+				if event.type == pygame.KEYDOWN and event.key == pygame.K_F4:
+					profiler.export_csv('profile.csv')
+					profiler.export_trace('profile_trace.json')
+
+			# catch up on game logic, then draw once between the last two ticks
+			for tick in range(self.loop.ticks()):
+				if self.controls.finished:
+					self.quit()
+				self.tick(self.loop.dt)
+			self.level.draw(self.loop.alpha)
 			pygame.display.update()
+			self.loop.wait()
+
+	# advances the game logic by dt, or by the recorded dt when replaying
+	def tick(self, dt):
+		dt = self.controls.update(dt)
+		self.sim_clock.advance(dt)
+		self.level.update(dt)
+
+	# one tick and one frame, as fast as the CPU allows
+	def step(self, dt):
+		self.tick(dt)
+		self.level.draw()
+
+	# steps through a whole input log as fast as the CPU allows
+	def replay(self):
+		frames = 0
+		while not self.controls.finished:
+			self.step(0)
+			frames += 1
+		return frames
+
+	def simulate(self, days, day_frames, dt):
+		for day in range(days):
+			for frame in range(day_frames):
+				self.step(dt)
+
+			# sleep through the night transition
+			self.level.player.sleep = True
+			while self.level.player.sleep:
+				self.step(dt)
 
 if __name__ == '__main__':
-	game = Game()
-	game.run()
+	parser = ArgumentParser(description='Stardew Knockoff')
+	parser.add_argument('--headless', action='store_true', help='simulate without a window, audio or real-time clock')
+	parser.add_argument('--seed', type=int, help='seed for weather and rain')
+	parser.add_argument('--days', type=int, default=1, help='days to simulate in headless mode')
+	parser.add_argument('--day-frames', type=int, default=600, help='frames played before sleeping each day')
+	parser.add_argument('--dt', type=float, default=1/TICK_RATE, help='fixed timestep in seconds (headless)')
+	parser.add_argument('--tick-rate', type=int, default=TICK_RATE, help='game logic ticks per second')
+	parser.add_argument('--fps', type=int, default=FPS_CAP, help='frame rate cap, 0 for uncapped')
+	parser.add_argument('--vsync', action='store_true', default=VSYNC, help='sync frames to the display refresh')
+	parser.add_argument('--render-scale', type=float, default=RENDER_SCALE, help='draw the world at this fraction of the resolution, e.g. 0.5')
+	parser.add_argument('--dynamic-scale', action='store_true', default=DYNAMIC_SCALE, help=f'lower the render scale while frames take over {RENDER_BUDGET * 1000:.1f} ms to draw')
+	parser.add_argument('--no-render', action='store_true', help='skip drawing in headless mode')
+	parser.add_argument('--profile', action='store_true', help='start with the profiler recording')
+	parser.add_argument('--alloc', action='store_true', help='also count allocations per scope and frame (slow)')
+	parser.add_argument('--csv', help='write per-frame profiler timings here on exit (headless)')
+	parser.add_argument('--trace', help='write a Chrome trace of profiler scopes here on exit (headless)')
+	parser.add_argument('--record', metavar='PATH', help='log the seed and every frame of input to this file')
+	parser.add_argument('--replay', metavar='PATH', help='play back an input log instead of reading the keyboard')
+	parser.add_argument('--save', metavar='PATH', help=f'farm save to load and autosave to (default {SAVE_PATH} in a window)')
+	args = parser.parse_args()
+
+	if args.profile or args.csv or args.trace:
+		profiler.toggle()
+	if args.alloc:
+		profiler.track_allocations()
+		profiler.visible = not args.headless
+
+	# headless, recorded and replayed runs start from a fresh farm unless given a save
+	save_path = args.save
+	if save_path is None and not (args.headless or args.record or args.replay):
+		save_path = SAVE_PATH
+
+	game = Game(args.headless, args.seed, not args.no_render, args.record, args.replay, args.tick_rate, args.fps, args.vsync,
+		save_path = save_path, render_scale = args.render_scale, dynamic_scale = args.dynamic_scale)
+	if args.headless:
+		start = perf_counter()
+		if args.replay:
+			frames = game.replay()
+			elapsed = perf_counter() - start
+			print(f'{frames} frames in {elapsed:.2f}s ({frames / elapsed:.0f} fps)')
+		else:
+			game.simulate(args.days, args.day_frames, args.dt)
+			elapsed = perf_counter() - start
+			print(f'{args.days} days in {elapsed:.2f}s ({args.days / elapsed * 60:.0f} days/min)')
+		game.controls.close()
+		if args.csv:
+			profiler.export_csv(args.csv)
+		if args.trace:
+			profiler.export_trace(args.trace)
+	else:
+		game.run()
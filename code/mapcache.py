@@ -0,0 +1,141 @@
+import hashlib
+import json
+import os
+import numpy as np
+from struct import Struct, error as StructError
+from xml.etree import ElementTree
+from settings import CACHE_DIR
+
+# layout: header, JSON metadata (sources, layer names, merged tile rects, objects, image references),
+# then one height x width uint16 array of Tiled gids per tile layer
+MAGIC = b'SKMP'
+VERSION = 2
+HEADER = Struct('<4sBHHI')
+
+class MapObject:
+    def __init__(self, name, x, y, width, height, image):
+        self.name = name
+        self.x = x
+        self.y = y
+        self.width = width
+        self.height = height
+        # (path, area or None) of the tile image for tile objects, else None
+        self.image = image
+
+class MapData:
+    def __init__(self, width, height, layers, rects, objects):
+        self.width = width
+        self.height = height
+        self.layers = layers
+        # (x, y, width, height) in tiles, covering each tile layer with as few rects as greedy meshing finds
+        self.rects = rects
+        self.objects = objects
+
+    # (x, y) of every tile in a tile layer, row by row like pytmx
+    def tiles(self, name):
+        return np.argwhere(self.layers[name])[:, ::-1].tolist()
+
+# greedy meshing: takes the longest run along a row, then grows it down while every tile below is set
+def merge_tiles(mask):
+    mask = mask.copy()
+    height, width = mask.shape
+    rects = []
+    for y in range(height):
+        x = 0
+        while x < width:
+            if not mask[y, x]:
+                x += 1
+                continue
+            right = x + 1
+            while right < width and mask[y, right]:
+                right += 1
+            bottom = y + 1
+            while bottom < height and mask[bottom, x:right].all():
+                bottom += 1
+            mask[y:bottom, x:right] = False
+            rects.append([x, y, right - x, bottom - y])
+            x = right
+    return rects
+
+def cache_path(path):
+    digest = hashlib.sha1(os.path.abspath(path).encode()).hexdigest()[:12]
+    name = os.path.splitext(os.path.basename(path))[0]
+    return os.path.join(CACHE_DIR, 'maps', f'{name}-{digest}.bin')
+
+def stamp(path):
+    stat = os.stat(path)
+    return [path, stat.st_mtime_ns, stat.st_size]
+
+# the slow path: parses the TMX and its tilesets with pytmx and writes the cache
+def compile_map(path, output):
+    import pytmx
+
+    # no image loader: tile images stay (path, area, flags) references
+    tmx_data = pytmx.TiledMap(path)
+    folder = os.path.dirname(path)
+    sources = [stamp(path)] + [
+        stamp(os.path.join(folder, tileset.get('source')))
+        for tileset in ElementTree.parse(path).getroot().iter('tileset') if tileset.get('source')]
+
+    layers, arrays, rects, objects = [], [], {}, {}
+    for layer in tmx_data.layers:
+        if isinstance(layer, pytmx.TiledTileLayer):
+            gids = np.array(layer.data, np.intp)
+            lookup = np.array([tmx_data.tiledgidmap.get(gid, 0) for gid in range(gids.max() + 1)], np.uint16)
+            layers.append(layer.name)
+            arrays.append(lookup[gids].astype('<u2'))
+            rects[layer.name] = merge_tiles(gids != 0)
+        elif isinstance(layer, pytmx.TiledObjectGroup):
+            objects[layer.name] = [
+                [obj.name, obj.x, obj.y, obj.width, obj.height, [obj.image[0], obj.image[1]] if obj.image else None]
+                for obj in layer]
+
+    meta = json.dumps({'sources': sources, 'layers': layers, 'rects': rects, 'objects': objects}).encode()
+    os.makedirs(os.path.dirname(output), exist_ok=True)
+    temp_path = output + '.tmp'
+    with open(temp_path, 'wb') as file:
+        file.write(HEADER.pack(MAGIC, VERSION, tmx_data.width, tmx_data.height, len(meta)))
+        file.write(meta)
+        for array in arrays:
+            file.write(array.tobytes())
+    os.replace(temp_path, output)
+
+# None when the cache is missing, truncated or corrupt, from another version or older than any of its sources, so it is compiled again
+def read_map(path):
+    try:
+        with open(path, 'rb') as file:
+            data = file.read()
+    except OSError:
+        return None
+
+    try:
+        magic, version, width, height, meta_size = HEADER.unpack_from(data)
+        if magic != MAGIC or version != VERSION:
+            return None
+        meta = json.loads(data[HEADER.size:HEADER.size + meta_size])
+        for source, mtime, size in meta['sources']:
+            try:
+                if stamp(source)[1:] != [mtime, size]:
+                    return None
+            except OSError:
+                return None
+
+        offset = HEADER.size + meta_size
+        layers = {}
+        for name in meta['layers']:
+            layers[name] = np.frombuffer(data, '<u2', width * height, offset).reshape(height, width)
+            offset += width * height * 2
+        objects = {
+            name: [MapObject(name, x, y, w, h, tuple(image) if image else None) for name, x, y, w, h, image in group]
+            for name, group in meta['objects'].items()}
+        return MapData(width, height, layers, meta['rects'], objects)
+    except (StructError, ValueError, KeyError, TypeError):
+        return None
+
+def load_compiled(path):
+    output = cache_path(path)
+    map_data = read_map(output)
+    if map_data is None:
+        compile_map(path, output)
+        map_data = read_map(output)
+    return map_data
@@ -1,5 +1,6 @@
 import pygame
 from settings import *
+from assets import load_image
 
 class Overlay:
     def __init__(self, player):
@@ -8,7 +9,7 @@ class Overlay:
         self.player = player
 
         overlay_path = '../graphics/overlay/'
-        self.items_surf = {item: pygame.image.load(f'{overlay_path}{item}.png').convert_alpha() 
+        self.items_surf = {item: load_image(f'{overlay_path}{item}.png')
                            for item in player.inventory}
 
     def display(self):
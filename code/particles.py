@@ -0,0 +1,56 @@
+import numpy as np
+
+class ParticleLayer:
+    def __init__(self, frames, capacity):
+        self.frames = frames
+        self.width = max(frame.get_width() for frame in frames)
+        self.height = max(frame.get_height() for frame in frames)
+
+        # fixed-size pool, one row per particle
+        self.pos = np.zeros((capacity, 2), np.float32)
+        self.velocity = np.zeros((capacity, 2), np.float32)
+        self.age = np.zeros(capacity, np.float32)
+        self.lifetime = np.zeros(capacity, np.float32)
+        self.frame = np.zeros(capacity, np.intp)
+        self.alive = np.zeros(capacity, bool)
+
+        # scratch rows for update, so a tick allocates no temporary arrays
+        self.step = np.zeros((capacity, 2), np.float32)
+        self.young = np.zeros(capacity, bool)
+
+    def __len__(self):
+        return int(np.count_nonzero(self.alive))
+
+    # fills free slots, dropping whatever does not fit in the pool
+    def emit(self, pos, velocity, lifetime, frame):
+        free = np.flatnonzero(~self.alive)[:len(pos)]
+        count = len(free)
+        self.pos[free] = pos[:count]
+        self.velocity[free] = velocity[:count]
+        self.lifetime[free] = lifetime[:count]
+        self.frame[free] = frame[:count]
+        self.age[free] = 0
+        self.alive[free] = True
+
+    def update(self, dt):
+        np.multiply(self.velocity, dt, out=self.step)
+        self.pos += self.step
+        self.age += dt
+        np.less(self.age, self.lifetime, out=self.young)
+        self.alive &= self.young
+
+    # one blits() call for the live particles overlapping view (world coordinates) on a RenderTarget
+    def draw(self, target, view):
+        x, y = self.pos[:, 0], self.pos[:, 1]
+        visible = np.flatnonzero(
+            self.alive &
+            (x > view.left - self.width) & (x < view.right) &
+            (y > view.top - self.height) & (y < view.bottom))
+        if len(visible):
+            scale = target.scale
+            frames = [target.image(frame) for frame in self.frames]
+            xs = np.rint((x[visible] - view.x) * scale).astype(int).tolist()
+            ys = np.rint((y[visible] - view.y) * scale).astype(int).tolist()
+            target.surface.blits(
+                [(frames[frame], (x, y)) for frame, x, y in zip(self.frame[visible].tolist(), xs, ys)],
+                doreturn=False)
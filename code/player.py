@@ -2,10 +2,14 @@ import pygame
 from settings import *
 from support import *
 from timer import Timer
+from profiler import profiler
+from controls import *
+from audio import audio
 
 class Player(pygame.sprite.Sprite):
-    def __init__(self, pos, group, collision_sprites, tree_sprites, interaction, soil_layer):
+    def __init__(self, pos, group, collision_sprites, tree_sprites, interaction, soil_layer, controls):
         super().__init__(group)
+        self.all_sprites = group
 
         self.import_assets()
         self.status = 'down_idle'
@@ -19,13 +23,14 @@ class Player(pygame.sprite.Sprite):
         # Movement attributes
         self.direction = pygame.math.Vector2()
         self.pos = pygame.math.Vector2(self.rect.center)
+        self.previous_center = self.rect.center
         self.speed = 200
 
         # Collision
         self.hitbox = self.rect.copy().inflate((-126, -70))
         self.collision_sprites = collision_sprites
 
-        # Timers
+        # Timers, fired by the scheduler once their duration is up
         self.timers = {
             'tool use': Timer(350, self.use_tool),
             'tool switch': Timer(200),
@@ -46,16 +51,16 @@ class Player(pygame.sprite.Sprite):
         self.sleep = False
         self.soil_layer = soil_layer
 
-        # Sound
-        self.watering = pygame.mixer.Sound('../audio/water.wav')
-        self.watering.set_volume(0.3)
+        # live, recorded or replayed input
+        self.controls = controls
 
     def use_tool(self):
+        self.get_target_pos()
         if self.selected_tool == 'hoe':
             self.soil_layer.get_hit(self.target_pos)
         elif self.selected_tool == 'water':
             self.soil_layer.water(self.target_pos)
-            self.watering.play()
+            audio.play('water')
         elif self.selected_tool in self.seed_inventory:
             # Plant seed if inventory allows
             if self.seed_inventory[self.selected_tool] > 0:
@@ -76,6 +81,10 @@ class Player(pygame.sprite.Sprite):
             full_path = '../graphics/character/' + animation
             self.animations[animation] = import_folder(full_path)
 
+        # status -> its idle and action variants, looked up instead of split every frame
+        self.idle_status = {status: status.split('_')[0] + '_idle' for status in self.animations}
+        self.action_status = {status: status.split('_')[0] + '_action' for status in self.animations}
+
     def animate(self, dt):
         self.frame_index += 4 * dt
         if self.frame_index >= len(self.animations[self.status]):
@@ -84,91 +93,88 @@ class Player(pygame.sprite.Sprite):
         self.image = self.animations[self.status][int(self.frame_index)]
 
     def input(self):
-        keys = pygame.key.get_pressed()
-        mouse_buttons = pygame.mouse.get_pressed()
+        actions = self.controls.actions
 
         if not self.timers['tool use'].active and not self.sleep:
             # Vertical movements
-            if keys[pygame.K_UP] or keys[pygame.K_w]:
+            if actions & UP:
                 self.direction.y = -1
                 self.status = 'up'
-            elif keys[pygame.K_DOWN] or keys[pygame.K_s]:
+            elif actions & DOWN:
                 self.direction.y = 1
                 self.status = 'down'
             else:
                 self.direction.y = 0
 
             # Horizontal movements
-            if keys[pygame.K_RIGHT] or keys[pygame.K_d]:
+            if actions & RIGHT:
                 self.direction.x = 1
                 self.status = 'right'
-            elif keys[pygame.K_LEFT] or keys[pygame.K_a]:
+            elif actions & LEFT:
                 self.direction.x = -1
                 self.status = 'left'
             else:
                 self.direction.x = 0
 
             # Use selected tool/seed
-            if mouse_buttons[0]:
+            if actions & USE:
                 # run timer for tool use
                 self.timers['tool use'].activate()
                 self.direction = pygame.math.Vector2()
                 self.frame_index = 0
 
             # Change tool/seed
-            if keys[pygame.K_TAB] and not self.timers['tool switch'].active:
+            if actions & SWITCH and not self.timers['tool switch'].active:
                 self.timers['tool switch'].activate()
                 self.inventory_index = (self.inventory_index + 1) % len(self.inventory)
                 self.selected_tool = self.inventory[self.inventory_index]
 
             # Spacebar to sleep
-            if keys[pygame.K_SPACE] and not self.timers['tool switch'].active:
+            if actions & SLEEP and not self.timers['tool switch'].active:
                 self.status = 'left_idle'
                 self.sleep = True
 
     def get_status(self):
         # Action animation
         if self.timers['tool use'].active:
-            self.status = self.status.split('_')[0] + '_action'
+            self.status = self.action_status[self.status]
         # Idle if no movement
         elif self.direction.magnitude() == 0:
-            self.status = self.status.split('_')[0] + '_idle'
-
-    def update_timers(self):
-        for timer in self.timers.values():
-            timer.update()
+            self.status = self.idle_status[self.status]
 
+    @profiler.timed('collision')
     def collision(self, direction):
-        for sprite in self.collision_sprites.sprites():
-            if hasattr(sprite, 'hitbox'):
-                if sprite.hitbox.colliderect(self.hitbox):
-                    # Horizontal Collision
-                    if direction == 'horizontal':
-                        if self.direction.x > 0:
-                            # moving right
-                            self.hitbox.right = sprite.hitbox.left
-
-                        if self.direction.x < 0:
-                            # moving left
-                            self.hitbox.left = sprite.hitbox.right
-                        self.rect.centerx = self.hitbox.centerx
-                        self.pos.x = self.hitbox.centerx
-
-                    # Vertical Collision
-                    if direction == 'vertical':
-                        if self.direction.y > 0:
-                            # moving down
-                            self.hitbox.bottom = sprite.hitbox.top
-
-                        if self.direction.y < 0:
-                            # moving up
-                            self.hitbox.top = sprite.hitbox.bottom
-                        self.rect.centery = self.hitbox.centery
-                        self.pos.y = self.hitbox.centery
-
+        for hitbox in self.collision_sprites.query(self.hitbox):
+            if hitbox.colliderect(self.hitbox):
+                # Horizontal Collision
+                if direction == 'horizontal':
+                    if self.direction.x > 0:
+                        # moving right
+                        self.hitbox.right = hitbox.left
+
+                    if self.direction.x < 0:
+                        # moving left
+                        self.hitbox.left = hitbox.right
+                    self.rect.centerx = self.hitbox.centerx
+                    self.pos.x = self.hitbox.centerx
+
+                # Vertical Collision
+                if direction == 'vertical':
+                    if self.direction.y > 0:
+                        # moving down
+                        self.hitbox.bottom = hitbox.top
+
+                    if self.direction.y < 0:
+                        # moving up
+                        self.hitbox.top = hitbox.bottom
+                    self.rect.centery = self.hitbox.centery
+                    self.pos.y = self.hitbox.centery
+
+    # in place, so a moving player allocates no vectors
+    @profiler.timed('movement')
     def move(self, dt):
         if self.direction.magnitude() > 0:
-            self.direction = self.direction.normalize()
+            self.direction.normalize_ip()
 
         self.pos.y += self.direction.y * self.speed * dt
         self.hitbox.centery = round(self.pos.y)
@@ -180,10 +186,18 @@ class Player(pygame.sprite.Sprite):
         self.rect.centerx = self.hitbox.centerx
         self.collision('horizontal')
 
+        # let the camera re-sort the main layer
+        if self.direction.x or self.direction.y:
+            self.all_sprites.mark_dirty(self)
+
+    # where to draw the player between its last two ticks
+    def interpolate(self, alpha):
+        x, y = self.previous_center
+        return (round(x + (self.rect.centerx - x) * alpha), round(y + (self.rect.centery - y) * alpha))
+
     def update(self, dt):
+        self.previous_center = self.rect.center
         self.input()
         self.get_status()
-        self.update_timers()
-        self.get_target_pos()
         self.move(dt)
         self.animate(dt)
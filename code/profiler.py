@@ -0,0 +1,308 @@
+import gc
+import json
+import tracemalloc
+import pygame
+import numpy as np
+from contextlib import nullcontext
+from functools import wraps
+from time import perf_counter
+from settings import *
+
+# returned by scope() while disabled, so an idle scope is one call and a branch
+NULL_SCOPE = nullcontext()
+
+COUNT_NAMES = ('sprites', 'plants', 'rain')
+
+class Scope:
+    def __init__(self, profiler, index):
+        self.profiler = profiler
+        self.index = index
+        self.start = 0
+        # a scope entered again while open, like water_all inside get_hit, is already being timed
+        self.open = 0
+
+    # memory is read last on the way in and first on the way out, so the scope's own bookkeeping is not counted
+    def __enter__(self):
+        self.open += 1
+        if self.open > 1:
+            return
+        self.profiler.depth += 1
+        self.start = perf_counter()
+        if self.profiler.tracing:
+            self.profiler.enter_allocations()
+
+    def __exit__(self, *exc):
+        self.open -= 1
+        if self.open:
+            return
+        if self.profiler.tracing:
+            self.profiler.exit_allocations(self.index)
+        end = perf_counter()
+        self.profiler.depth -= 1
+        self.profiler.record(self.index, self.start, end)
+
+class Profiler:
+    def __init__(self, frames=PROFILER_FRAMES, events=PROFILER_EVENTS, max_scopes=16):
+        self.enabled = False
+        self.visible = False
+        self.names = []
+        self.scopes = {}
+        self.nested = []
+        self.depth = 0
+
+        # per-frame milliseconds per scope and sprite counts, as ring buffers
+        self.frame_ms = np.zeros((frames, max_scopes))
+        self.frame_counts = np.zeros((frames, len(COUNT_NAMES)), np.int64)
+        self.frame_count = 0
+        self.current = [0.0] * max_scopes
+
+        # every scope entry, kept for trace export
+        self.event_scope = np.zeros(events, np.int16)
+        self.event_start = np.zeros(events)
+        self.event_duration = np.zeros(events)
+        self.event_count = 0
+        self.origin = perf_counter()
+
+        # with tracemalloc on: bytes each scope left allocated and the most it held at once, per frame
+        self.tracing = False
+        self.frame_bytes = np.zeros((frames, max_scopes), np.int64)
+        self.frame_peak = np.zeros((frames, max_scopes), np.int64)
+        self.current_bytes = np.zeros(max_scopes, np.int64)
+        self.current_peak = np.zeros(max_scopes, np.int64)
+        # traced memory on entry and high-water mark of every open scope, indexed by depth;
+        # numpy so storing them allocates nothing the enclosing scope would see
+        self.alloc_start = np.zeros(64, np.int64)
+        self.alloc_high = np.zeros(64, np.int64)
+        # what an empty scope reads, taken off every measurement
+        self.alloc_bias = 0
+        self.peak_bias = 0
+
+        # bytes the whole frame left allocated, and garbage collections run during it
+        self.frame_allocated = np.zeros(frames, np.int64)
+        self.frame_collections = np.zeros(frames, np.int64)
+        self.traced = 0
+        self.collections = 0
+        self.gc_start = 0
+
+        self.font = None
+
+    def toggle(self):
+        self.enabled = self.visible = not self.enabled
+
+    # counts allocations per scope and frame with tracemalloc, and times garbage collections
+    # as a 'gc' scope; tracemalloc slows everything down, so frame times are not comparable
+    def track_allocations(self):
+        if self.tracing:
+            return
+        self.enabled = True
+        tracemalloc.start()
+        self.alloc_bias, self.peak_bias = self.calibrate()
+        self.scope('gc')
+        self.nested[self.scopes['gc'].index] = True
+        gc.callbacks.append(self.on_gc)
+        self.traced = tracemalloc.get_traced_memory()[0]
+        self.tracing = True
+
+    # the with statement and the reads themselves move traced memory a little; measured on a spare profiler
+    def calibrate(self, runs=16):
+        probe = Profiler(frames=1, events=1, max_scopes=1)
+        probe.enabled = probe.tracing = True
+        scope = probe.scope('probe')
+        for run in range(2 * runs):
+            # the first half only warms up
+            if run == runs:
+                probe.current_bytes[:] = 0
+                probe.current_peak[:] = 0
+            with scope:
+                pass
+        return int(probe.current_bytes[0]) // runs, int(probe.current_peak[0])
+
+    def on_gc(self, phase, info):
+        if phase == 'start':
+            self.gc_start = perf_counter()
+        else:
+            self.collections += 1
+            self.record(self.scopes['gc'].index, self.gc_start, perf_counter())
+
+    def enter_allocations(self):
+        current, peak = tracemalloc.get_traced_memory()
+        depth = self.depth
+        # the enclosing scope keeps the high-water mark it reached before the reset below
+        if depth > 1 and peak > self.alloc_high[depth - 1]:
+            self.alloc_high[depth - 1] = peak
+        self.alloc_start[depth] = current
+        self.alloc_high[depth] = current
+        tracemalloc.reset_peak()
+
+    def exit_allocations(self, index):
+        current, peak = tracemalloc.get_traced_memory()
+        depth = self.depth
+        high = max(peak, self.alloc_high[depth])
+        if depth > 1:
+            if high > self.alloc_high[depth - 1]:
+                self.alloc_high[depth - 1] = high
+            # the enclosing scope reads this one's bookkeeping too
+            self.alloc_start[depth - 1] += self.alloc_bias
+        self.current_bytes[index] += current - self.alloc_start[depth] - self.alloc_bias
+        self.current_peak[index] = max(self.current_peak[index], high - self.alloc_start[depth] - self.peak_bias)
+
+    def scope(self, name):
+        if not self.enabled:
+            return NULL_SCOPE
+        scope = self.scopes.get(name)
+        if scope is None:
+            if len(self.names) == len(self.current):
+                self.grow_columns()
+            scope = self.scopes[name] = Scope(self, len(self.names))
+            self.names.append(name)
+            # scopes first seen inside another scope are left out of the stacked graph
+            self.nested.append(self.depth > 0)
+        return scope
+
+    # doubles every per-scope buffer once all columns are named, keeping what was recorded
+    def grow_columns(self):
+        width = 2 * len(self.current)
+        grow = lambda buffer: np.concatenate((buffer, np.zeros_like(buffer)), axis=-1)
+        self.frame_ms = grow(self.frame_ms)
+        self.frame_bytes = grow(self.frame_bytes)
+        self.frame_peak = grow(self.frame_peak)
+        self.current_bytes = grow(self.current_bytes)
+        self.current_peak = grow(self.current_peak)
+        self.current += [0.0] * (width - len(self.current))
+
+    # decorator for methods that should always run inside a scope
+    def timed(self, name):
+        def decorator(func):
+            @wraps(func)
+            def wrapper(*args, **kwargs):
+                if not self.enabled:
+                    return func(*args, **kwargs)
+                with self.scope(name):
+                    return func(*args, **kwargs)
+            return wrapper
+        return decorator
+
+    def record(self, index, start, end):
+        event = self.event_count % len(self.event_scope)
+        self.event_scope[event] = index
+        self.event_start[event] = start
+        self.event_duration[event] = end - start
+        self.event_count += 1
+        self.current[index] += end - start
+
+    def end_frame(self, *counts):
+        if not self.enabled:
+            return
+        row = self.frame_count % len(self.frame_ms)
+        self.frame_ms[row] = self.current
+        self.frame_ms[row] *= 1000
+        self.frame_counts[row] = counts
+        if self.tracing:
+            self.frame_bytes[row] = self.current_bytes
+            self.frame_peak[row] = self.current_peak
+            self.current_bytes[:] = 0
+            self.current_peak[:] = 0
+            traced = tracemalloc.get_traced_memory()[0]
+            self.frame_allocated[row] = traced - self.traced
+            self.frame_collections[row] = self.collections
+            self.traced = traced
+            self.collections = 0
+        self.frame_count += 1
+        # cleared in place, so the profiler adds no allocation of its own to the frame
+        for index in range(len(self.current)):
+            self.current[index] = 0.0
+
+    # the last n frames in order, oldest first
+    def recent(self, buffer, n):
+        n = min(n, self.frame_count, len(buffer))
+        rows = np.arange(self.frame_count - n, self.frame_count) % len(buffer)
+        return buffer[rows]
+
+    def export_csv(self, path):
+        frames = self.recent(self.frame_ms, len(self.frame_ms))
+        counts = self.recent(self.frame_counts, len(self.frame_counts))
+        first = self.frame_count - len(frames)
+        header = ['frame'] + [f'{name}_ms' for name in self.names] + list(COUNT_NAMES)
+        if self.tracing:
+            scope_bytes = self.recent(self.frame_bytes, len(self.frame_bytes))
+            allocated = self.recent(self.frame_allocated, len(self.frame_allocated))
+            collections = self.recent(self.frame_collections, len(self.frame_collections))
+            header += [f'{name}_bytes' for name in self.names] + ['allocated_bytes', 'collections']
+        with open(path, 'w') as file:
+            file.write(','.join(header) + '\n')
+            for offset, (row, count) in enumerate(zip(frames, counts)):
+                values = [str(first + offset)] + [f'{ms:.4f}' for ms in row[:len(self.names)]] + [str(c) for c in count]
+                if self.tracing:
+                    values += [str(b) for b in scope_bytes[offset][:len(self.names)]]
+                    values += [str(allocated[offset]), str(collections[offset])]
+                file.write(','.join(values) + '\n')
+
+    # mean bytes per frame each scope left allocated and held at most over the last frames, plus frame totals
+    def allocation_summary(self, frames=PROFILER_FRAMES):
+        frames = len(self.recent(self.frame_allocated, frames))
+        scope_bytes = self.recent(self.frame_bytes, frames)
+        scope_peak = self.recent(self.frame_peak, frames)
+        return {
+            'allocated_bytes': float(self.recent(self.frame_allocated, frames).mean()),
+            'collections': int(self.recent(self.frame_collections, frames).sum()),
+            'scopes': {name: {'bytes': float(scope_bytes[:, index].mean()), 'peak_bytes': float(scope_peak[:, index].mean())}
+                       for index, name in enumerate(self.names) if name != 'gc'},
+        }
+
+    # Chrome trace event format, loadable in chrome://tracing or Perfetto
+    def export_trace(self, path):
+        total = min(self.event_count, len(self.event_scope))
+        order = np.arange(self.event_count - total, self.event_count) % len(self.event_scope)
+        events = [{
+            'name': self.names[self.event_scope[event]],
+            'ph': 'X',
+            'ts': (self.event_start[event] - self.origin) * 1e6,
+            'dur': self.event_duration[event] * 1e6,
+            'pid': 0,
+            'tid': 0,
+        } for event in order.tolist()]
+        with open(path, 'w') as file:
+            json.dump({'traceEvents': events, 'displayTimeUnit': 'ms'}, file)
+
+    def display(self, surface):
+        if self.font is None:
+            self.font = pygame.font.Font(None, 20)
+
+        frames = self.recent(self.frame_ms, PROFILER_GRAPH_FRAMES)
+        if not len(frames):
+            return
+        counts = self.recent(self.frame_counts, 1)[0]
+
+        # stacked bars of the top-level scopes, one column per frame
+        graph = pygame.Rect(10, 10, PROFILER_GRAPH_FRAMES * 2, 100)
+        pygame.draw.rect(surface, (20, 20, 20), graph)
+        budget_y = graph.bottom - graph.height // 2
+        pygame.draw.line(surface, (90, 90, 90), (graph.left, budget_y), (graph.right, budget_y))
+        scale = graph.height / 2 / (1000 / 60)
+        for column, row in enumerate(frames):
+            bottom = graph.bottom
+            for index, ms in enumerate(row[:len(self.names)]):
+                if self.nested[index] or not ms:
+                    continue
+                height = max(1, int(ms * scale))
+                rect = pygame.Rect(graph.left + column * 2, bottom - height, 2, height).clip(graph)
+                surface.fill(PROFILER_COLORS[index % len(PROFILER_COLORS)], rect)
+                bottom -= height
+
+        # average and worst milliseconds per scope over the graph window
+        lines = [(name, f'{frames[:, index].mean():6.2f} avg {frames[:, index].max():6.2f} max', index)
+                 for index, name in enumerate(self.names)]
+        # and the bytes each left allocated in the last frame
+        if self.tracing:
+            scope_bytes = self.recent(self.frame_bytes, 1)[0]
+            lines = [(name, f'{value}  {scope_bytes[index]:+7d} B', index) for name, value, index in lines]
+        lines += [(name, str(count), None) for name, count in zip(COUNT_NAMES, counts)]
+        y = graph.bottom + 6
+        for name, value, index in lines:
+            color = 'white' if index is None else PROFILER_COLORS[index % len(PROFILER_COLORS)]
+            indent = 12 if index is not None and self.nested[index] else 0
+            surface.blit(self.font.render(name, True, color, (20, 20, 20)), (graph.left + indent, y))
+            surface.blit(self.font.render(value, True, color, (20, 20, 20)), (graph.left + 130, y))
+            y += 16
+
+profiler = Profiler()
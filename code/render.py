@@ -0,0 +1,78 @@
+import pygame
+from math import ceil
+from weakref import WeakKeyDictionary
+from settings import *
+
+class RenderTarget:
+    def __init__(self, scale=RENDER_SCALE, dynamic=DYNAMIC_SCALE, budget=RENDER_BUDGET, scales=RENDER_SCALES):
+        self.display_surface = pygame.display.get_surface()
+
+        # dynamic mode steps between the given scale and the smaller ones
+        self.scales = sorted({scale, *(step for step in scales if step < scale)}, reverse=True)
+        self.dynamic = dynamic
+        self.budget = budget
+
+        # smoothed draw time, and frames left before the scale may move again;
+        # the first frames bake chunks, so they are not held against the budget
+        self.frame_time = 0
+        self.cooldown = RENDER_COOLDOWN
+
+        self.set_scale(scale)
+
+    def set_scale(self, scale):
+        self.scale = scale
+
+        # scaled copies of every image drawn, dropped along with the image
+        self.images = WeakKeyDictionary()
+
+        # at full scale the world goes straight to the display
+        if scale == 1:
+            self.surface = self.display_surface
+        else:
+            width, height = self.display_surface.get_size()
+            self.surface = pygame.Surface((round(width * scale), round(height * scale))).convert()
+
+    # surf at the render scale, rounded up so neighbouring tiles never leave a gap
+    def image(self, surf):
+        if self.scale == 1:
+            return surf
+        scaled = self.images.get(surf)
+        if scaled is None:
+            width, height = surf.get_size()
+            scaled = self.images[surf] = pygame.transform.scale(surf, (ceil(width * self.scale), ceil(height * self.scale)))
+        return scaled
+
+    # call when surf was drawn into since it was last scaled
+    def forget(self, surf):
+        self.images.pop(surf, None)
+
+    # blits surf at a position in display pixels
+    def blit(self, surf, pos):
+        if self.scale == 1:
+            self.surface.blit(surf, pos)
+        else:
+            self.surface.blit(self.image(surf), (round(pos[0] * self.scale), round(pos[1] * self.scale)))
+
+    # one upscale of the world to the display per frame
+    def present(self):
+        if self.surface is not self.display_surface:
+            pygame.transform.scale(self.surface, self.display_surface.get_size(), self.display_surface)
+
+    # lowers the scale while drawing runs over budget, and raises it again once well under
+    def adapt(self, seconds):
+        if not self.dynamic:
+            return
+        self.frame_time += (seconds - self.frame_time) * 0.1
+        if self.cooldown:
+            self.cooldown -= 1
+            return
+
+        index = self.scales.index(self.scale)
+        if self.frame_time > self.budget and index + 1 < len(self.scales):
+            self.set_scale(self.scales[index + 1])
+        elif self.frame_time < self.budget / 2 and index > 0:
+            self.set_scale(self.scales[index - 1])
+        else:
+            return
+        # give the average time to settle at the new scale
+        self.cooldown = RENDER_COOLDOWN
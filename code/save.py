@@ -0,0 +1,119 @@
+import os
+import threading
+import numpy as np
+from struct import Struct
+
+# layout: header, soil grid, plant columns (cells, crop types, ages), a name table, then the two inventories
+MAGIC = b'SKSV'
+VERSION = 1
+HEADER = Struct('<4sBHHIB')
+COUNT = Struct('<H')
+ENTRY = Struct('<HI')
+
+def encode(state):
+    rows, cols = state['grid'].shape
+    count = len(state['plant_ages'])
+
+    # crop types come first so plant_types index the table directly
+    names = list(state['crop_types'])
+    for inventory in (state['item_inventory'], state['seed_inventory']):
+        names += [name for name in inventory if name not in names]
+    index = {name: position for position, name in enumerate(names)}
+
+    parts = [
+        HEADER.pack(MAGIC, VERSION, rows, cols, count, state['raining']),
+        state['grid'].astype(np.uint8).tobytes(),
+        state['plant_cells'].astype('<u2').tobytes(),
+        state['plant_types'].astype(np.uint8).tobytes(),
+        state['plant_ages'].astype('<f4').tobytes(),
+        COUNT.pack(len(names)),
+    ]
+    for name in names:
+        data = name.encode()
+        parts += [bytes((len(data),)), data]
+    for inventory in (state['item_inventory'], state['seed_inventory']):
+        parts.append(COUNT.pack(len(inventory)))
+        parts += [ENTRY.pack(index[name], amount) for name, amount in inventory.items()]
+    return b''.join(parts)
+
+def decode(data):
+    magic, version, rows, cols, count, raining = HEADER.unpack_from(data)
+    if magic != MAGIC or version != VERSION:
+        raise ValueError(f'not a version {VERSION} save')
+    offset = HEADER.size
+
+    def read(dtype, length):
+        nonlocal offset
+        array = np.frombuffer(data, dtype, length, offset)
+        offset += array.nbytes
+        return array
+
+    grid = read(np.uint8, rows * cols).reshape(rows, cols)
+    cells = read('<u2', count * 2).reshape(count, 2)
+    types = read(np.uint8, count)
+    ages = read('<f4', count)
+
+    (name_count,) = COUNT.unpack_from(data, offset)
+    offset += COUNT.size
+    names = []
+    for _ in range(name_count):
+        length = data[offset]
+        names.append(data[offset + 1:offset + 1 + length].decode())
+        offset += 1 + length
+
+    inventories = []
+    for _ in range(2):
+        (entries,) = COUNT.unpack_from(data, offset)
+        offset += COUNT.size
+        inventory = {}
+        for _ in range(entries):
+            name, amount = ENTRY.unpack_from(data, offset)
+            inventory[names[name]] = amount
+            offset += ENTRY.size
+        inventories.append(inventory)
+
+    return {
+        'grid': grid.copy(),
+        'crop_types': names,
+        'plant_cells': cells.astype(np.intp),
+        'plant_types': types,
+        'plant_ages': ages.astype(np.float64),
+        'item_inventory': inventories[0],
+        'seed_inventory': inventories[1],
+        'raining': bool(raining),
+    }
+
+class SaveFile:
+    def __init__(self, path):
+        self.path = path
+        self.thread = None
+
+    def exists(self):
+        return os.path.exists(self.path)
+
+    def load(self):
+        self.wait()
+        with open(self.path, 'rb') as file:
+            return decode(file.read())
+
+    # state must already be a copy; encoding and writing happen on a background thread
+    def save(self, state):
+        self.wait()
+        self.thread = threading.Thread(target=self.write, args=(state,), name='autosave')
+        self.thread.start()
+
+    def write(self, state):
+        data = encode(state)
+        folder = os.path.dirname(self.path)
+        if folder:
+            os.makedirs(folder, exist_ok=True)
+        # write beside the old save and swap, so a crash mid-write keeps the previous day
+        temp_path = self.path + '.tmp'
+        with open(temp_path, 'wb') as file:
+            file.write(data)
+        os.replace(temp_path, self.path)
+
+    def wait(self):
+        if self.thread:
+            self.thread.join()
+            self.thread = None
@@ -3,6 +3,9 @@ from pygame.math import Vector2
 SCREEN_WIDTH = 1280
 SCREEN_HEIGHT = 720
 TILE_SIZE = 64
+CHUNK_SIZE = 512
+MAP_PATH = '../data/map.tmx'
+ANIMATED_CHUNK_CACHE = 48
 
 # overlay positions 
 OVERLAY_POSITIONS = {
@@ -32,4 +35,65 @@ LAYERS = {
 
 GROW_SPEED = {
 	'tomato': 1
-}
\ No newline at end of file
+}
+
+# growth stage frames per crop type
+CROP_FRAMES = {
+	'tomato': '../graphics/tomato'
+}
+
+# sound effects: path, volume, priority and how many copies may play at once
+SOUNDS = {
+	'hoe': ('../audio/hoe.wav', 0.1, 1, 2),
+	'plant': ('../audio/plant.wav', 0.2, 1, 2),
+	'water': ('../audio/water.wav', 0.3, 1, 1),
+	'success': ('../audio/success.wav', 0.5, 2, 2),
+}
+AUDIO_CHANNELS = 8
+MUSIC_PATH = '../audio/music.mp3'
+MUSIC_VOLUME = 0.5
+
+# map chunks kept loaded around the view, and the most kept before the least recently used go
+STREAM_MARGIN = 1
+STREAM_MAX_CHUNKS = 64
+GROUND_PATH = '../graphics/world/ground.png'
+CACHE_DIR = '../cache'
+
+# side of each texture atlas page
+ATLAS_SIZE = 1024
+
+# farm autosave, used when playing in a window
+SAVE_PATH = '../saves/farm.sav'
+
+# game logic runs in fixed ticks; frames are capped at FPS_CAP (0 for uncapped)
+TICK_RATE = 60
+FPS_CAP = 144
+VSYNC = False
+# longest stall simulated after a hitch, and how early the frame limiter stops sleeping
+MAX_FRAME_TIME = 0.25
+SLEEP_MARGIN = 0.002
+
+# world drawn at this fraction of the display resolution and upscaled, the HUD stays native;
+# dynamic scaling steps down RENDER_SCALES while a frame takes longer than RENDER_BUDGET to draw
+RENDER_SCALE = 1
+RENDER_SCALES = (1, 0.75, 0.5)
+DYNAMIC_SCALE = False
+RENDER_BUDGET = 1 / 120
+RENDER_COOLDOWN = 60
+
+# a layer with more moved sprites than this in one frame is sorted whole rather than one sprite at a time
+RESORT_MOVED = 16
+
+# day tint and sleep fade are refilled only when they move this far
+LIGHT_STEP = 2
+
+# particles per second for each of rain floor and rain drops
+RAIN_RATE = 300
+
+# profiler ring buffers and overlay
+PROFILER_FRAMES = 600
+PROFILER_EVENTS = 65536
+PROFILER_GRAPH_FRAMES = 120
+PROFILER_COLORS = [
+	(230, 90, 80), (240, 170, 60), (230, 220, 80), (120, 200, 90),
+	(80, 190, 200), (90, 130, 230), (170, 110, 220), (220, 120, 180)]
\ No newline at end of file
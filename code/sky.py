@@ -1,71 +1,63 @@
-import pygame
 from settings import *
 from support import import_folder
-from sprites import Generic
-from random import randint, choice
+from particles import ParticleLayer
+import numpy as np
 
 class Sky:
+    # darkens start_color towards end_color; drawn by Lighting
     def __init__(self):
-        self.display_surface = pygame.display.get_surface()
-        self.full_surf = pygame.Surface((SCREEN_WIDTH, SCREEN_HEIGHT))
         self.start_color = [255,255,255]
         self.end_color = [35,100,190]
 
-    def display(self, dt):
+    def update(self, dt):
         for index, value in enumerate(self.end_color):
             if self.start_color[index] > value:
                 self.start_color[index] -= 2 * dt
 
-        self.full_surf.fill(self.start_color)
-        self.display_surface.blit(self.full_surf, (0,0), special_flags=pygame.BLEND_RGB_MULT)
-
-class Drop(Generic):
-    def __init__(self, surf, pos, moving, groups, z):
-        # general setup
-        super().__init__(pos,surf,groups,z)
-        self.lifetime = randint(400, 500)
-        self.start_time = pygame.time.get_ticks()
-
-        # moving
-        self.moving = moving
-        if self.moving:
-            self.pos = pygame.math.Vector2(self.rect.topleft)
-            self.direction = pygame.math.Vector2(-2,4)
-            self.speed = randint(200,500)
-
-    def update(self, dt):
-        # movement
-        if self.moving:
-            self.pos += self.direction * self.speed * dt
-            self.rect.topleft = (round(self.pos.x), round(self.pos.y))
-
-        # timer
-        if pygame.time.get_ticks() - self.start_time >= self.lifetime:
-            self.kill()
-
 class Rain:
-    def __init__(self, all_sprites):
-        self.all_sprites = all_sprites
-        self.rain_drops = import_folder('../graphics/rain/drops/')
-        self.rain_floor = import_folder('../graphics/rain/floor/')
-        self.floor_w, self.floor_h = pygame.image.load('../graphics/world/ground.png').get_size()
-
-    def create_floor(self):
-        Drop(
-            surf = choice(self.rain_floor),
-            pos = (randint(0,self.floor_w), randint(0,self.floor_h)),
-            moving = False,
-            groups = self.all_sprites,
-            z = LAYERS['rain floor'])
+    def __init__(self, all_sprites, map_size, rng=None, rate=RAIN_RATE):
+        self.floor_w, self.floor_h = map_size
+        self.rng = rng or np.random.default_rng()
+
+        # pooled particles, big enough for one second of rain
+        self.rate = rate
+        self.rain_floor = ParticleLayer(import_folder('../graphics/rain/floor/'), rate)
+        self.rain_drops = ParticleLayer(import_folder('../graphics/rain/drops/'), rate)
+        self.spawn_budget = 0
+
+        # advanced and drawn by the camera group, so they finish after the rain stops
+        all_sprites.batch_layers[LAYERS['rain floor']] = self.rain_floor
+        all_sprites.batch_layers[LAYERS['rain drops']] = self.rain_drops
+        all_sprites.animations.extend((self.rain_floor, self.rain_drops))
+
+    def random_positions(self, count):
+        x = self.rng.integers(0, self.floor_w, count, endpoint=True)
+        y = self.rng.integers(0, self.floor_h, count, endpoint=True)
+        return np.column_stack((x, y))
+
+    def random_lifetimes(self, count):
+        return self.rng.integers(400, 500, count, endpoint=True) / 1000
+
+    def create_floor(self, count):
+        self.rain_floor.emit(
+            pos = self.random_positions(count),
+            velocity = np.zeros((count, 2)),
+            lifetime = self.random_lifetimes(count),
+            frame = self.rng.integers(0, len(self.rain_floor.frames), count))
+
+    def create_drops(self, count):
+        speed = self.rng.integers(200, 500, count, endpoint=True)
+        self.rain_drops.emit(
+            pos = self.random_positions(count),
+            velocity = np.outer(speed, (-2, 4)),
+            lifetime = self.random_lifetimes(count),
+            frame = self.rng.integers(0, len(self.rain_drops.frames), count))
 
-    def create_drops(self):
-        Drop(
-            surf=choice(self.rain_drops),
-            pos=(randint(0, self.floor_w), randint(0, self.floor_h)),
-            moving=True,
-            groups=self.all_sprites,
-            z=LAYERS['rain drops'])
-
-    def update(self):
-        self.create_floor()
-        self.create_drops()
\ No newline at end of file
+    def update(self, dt):
+        # spawn by elapsed time, not per frame
+        self.spawn_budget += self.rate * dt
+        count = int(self.spawn_budget)
+        if count:
+            self.spawn_budget -= count
+            self.create_floor(count)
+            self.create_drops(count)
@@ -1,184 +1,220 @@
 import pygame
 from settings import *
-from pytmx.util_pygame import load_pygame
+from assets import load_image, load_map
 from support import *
+from profiler import profiler
+from audio import audio
+from crops import CropField
 from random import choice
+import numpy as np
 
-
-class SoilTile(pygame.sprite.Sprite):
-    def __init__(self, pos, surf, groups):
-        super().__init__(groups)
-        self.image = surf
-        self.rect = self.image.get_rect(topleft = pos)
-        self.z = LAYERS['soil']
-
-
-class WaterTile(pygame.sprite.Sprite):
-    def __init__(self, pos, surf, groups):
-        super().__init__(groups)
-        self.image = surf
-        self.rect = self.image.get_rect(topleft = pos)
-        self.z = LAYERS['soil water']
+# soil grid flags, one bit each
+FARMABLE = np.uint8(1)
+TILLED = np.uint8(2)
+WATERED = np.uint8(4)
+PLANTED = np.uint8(8)
+RIPE = np.uint8(16)
 
 
 class Plant(pygame.sprite.Sprite):
-    def __init__(self, plant_type, groups, soil, check_watered):
+    # draws one crop of a CropField; growth lives in the field's columns
+    def __init__(self, field, index, groups, soil_rect, frames):
         super().__init__(groups)
 
         # setup
-        self.plant_type = plant_type
-        self.frames = import_folder(f'../graphics/tomato')
-        self.soil = soil
-        self.check_watered = check_watered
-
-        # plant growing
-        self.age = 0
-        self.max_age = len(self.frames) - 1
-        self.grow_speed = GROW_SPEED[plant_type]
-        self.harvestable = False
+        self.field = field
+        self.index = index
+        self.plant_type = field.crop_types[field.kind[index]]
+        self.cell = (int(field.row[index]), int(field.col[index]))
+        self.frames = frames
+        self.soil_rect = soil_rect
 
         # sprite setup
-        self.image = self.frames[int(len(self.frames) - self.age - 1)]
         self.y_offset = -8
-        self.rect = self.image.get_rect(midbottom=soil.rect.midbottom + pygame.math.Vector2(0, self.y_offset))
         self.z = LAYERS['ground plant']
+        self.refresh()
 
-    def grow(self):
-        if self.check_watered(self.rect.center):
-            self.age += self.grow_speed
+    @property
+    def age(self):
+        return float(self.field.age[self.index])
 
-            # if plant age is greater than 0 move it into main layer
-            if int(self.age) > 0:
-                self.z = LAYERS['main']
-                self.hitbox = self.rect.copy().inflate(-26, -self.rect.height * 0.4)
+    @property
+    def harvestable(self):
+        return bool(self.field.harvestable[self.index])
 
-            if self.age >= self.max_age:
-                self.age = self.max_age
-                self.harvestable = True
+    # brings image, layer and hitbox in line with the crop's growth stage
+    def refresh(self):
+        stage = int(self.age)
+        self.image = self.frames[len(self.frames) - stage - 1]
+        self.rect = self.image.get_rect(midbottom = self.soil_rect.midbottom + pygame.math.Vector2(0,self.y_offset))
 
-            self.image = self.frames[int(len(self.frames) - self.age - 1)]
-            self.rect = self.image.get_rect(midbottom = self.soil.rect.midbottom + pygame.math.Vector2(0,self.y_offset))
+        # if plant age is greater than 0 move it into main layer
+        if stage > 0:
+            self.z = LAYERS['main']
+            self.hitbox = self.rect.copy().inflate(-26, -self.rect.height * 0.4)
 
 class SoilLayer:
-    def __init__(self, all_sprites, collision_sprites):
+    def __init__(self, all_sprites, collision_sprites, background, map_path=MAP_PATH):
         # Sprite groups
         self.all_sprites = all_sprites
+        self.background = background
         self.collision_sprites = collision_sprites
-        self.soil_sprites = pygame.sprite.Group()
-        self.water_sprites = pygame.sprite.Group()
         self.plant_sprites = pygame.sprite.Group()
 
+        # crop columns, and the sprite drawing each live crop by its field index
+        self.crop_frames = {crop_type: import_folder(path) for crop_type, path in CROP_FRAMES.items()}
+        self.crops = CropField(CROP_FRAMES, {crop_type: len(frames) - 1 for crop_type, frames in self.crop_frames.items()})
+        self.plants = {}
+
+        # ripe crops are flagged RIPE in the grid and found by tile; plants are drawn above their
+        # tile, so a rect can touch crops up to one frame height below it
+        self.plant_cells = {}
+        self.plant_reach = max(frame.get_height() for frames in self.crop_frames.values() for frame in frames)
+
+        # soil and wet-soil overlays baked into the background, keyed by (row, col)
+        self.soil_pieces = {}
+        self.water_pieces = {}
+
         # Load single soil graphic
-        self.soil_surf = pygame.image.load('../graphics/soil/soil.png').convert_alpha()
-        self.water_surf = pygame.image.load('../graphics/soil/soil_water.png').convert_alpha()
-
-        self.create_soil_grid()
-        self.create_hit_rects()
-        
-        # Sounds
-        self.hoe_sound = pygame.mixer.Sound('../audio/hoe.wav')
-        self.hoe_sound.set_volume(0.1)
-        self.plant_sound = pygame.mixer.Sound('../audio/plant.wav')
-        self.plant_sound.set_volume(0.2)
-
-    def create_soil_tiles(self):
-        self.soil_sprites.empty()
-        for index_row, row in enumerate(self.grid):
-            for index_col, cell in enumerate(row):
-                if 'X' in cell:
-                    # Place a soil tile at this grid location
-                    SoilTile(
-                        pos=(index_col * TILE_SIZE, index_row * TILE_SIZE),
-                        surf=self.soil_surf,  # Use single soil image
-                        groups=[self.all_sprites, self.soil_sprites]
-                    )
-
-    def create_soil_grid(self):
-        ground = pygame.image.load('../graphics/world/ground.png')
-        h_tiles, v_tiles = ground.get_width() // TILE_SIZE, ground.get_height() // TILE_SIZE
-
-        self.grid = [ [[] for col in range(h_tiles)] for row in range(v_tiles)]
-        for x, y, _ in load_pygame('../data/map.tmx').get_layer_by_name('Farmable').tiles():
-            self.grid[y][x].append('F')
-
-    def create_hit_rects(self):
-        self.hit_rects = []
-
-        for index_row, row in enumerate(self.grid):
-            for index_col, cell in enumerate(row):
-                if 'F' in cell:
-                    x = index_col * TILE_SIZE
-                    y = index_row * TILE_SIZE
-                    rect = pygame.Rect(x,y,TILE_SIZE, TILE_SIZE)
-                    self.hit_rects.append(rect)
+        self.soil_surf = load_image('../graphics/soil/soil.png')
+        self.water_surf = load_image('../graphics/soil/soil_water.png')
 
-    def get_hit(self, point):
-        for rect in self.hit_rects:
-            if rect.collidepoint(point):
-                self.hoe_sound.play()
-                x = rect.x // TILE_SIZE
-                y = rect.y // TILE_SIZE
-
-                if 'F' in self.grid[y][x]:
-                    self.grid[y][x].append('X')
-                    self.create_soil_tiles()
-                    if self.raining:
-                        self.water_all()
+        self.create_soil_grid(map_path)
 
-    def water(self, target_pos):
-        for soil_sprite in self.soil_sprites.sprites():
-            if soil_sprite.rect.collidepoint(target_pos):
+    def create_soil_tile(self, cell):
+        if cell not in self.soil_pieces:
+            pos = self.tile_rect(cell).topleft
+            self.soil_pieces[cell] = self.background.add(self.soil_surf, pos, LAYERS['soil'])
 
-                x = soil_sprite.rect.x // TILE_SIZE
-                y = soil_sprite.rect.y // TILE_SIZE
-                self.grid[y][x].append('W')
+    def create_water_tile(self, cell):
+        if cell not in self.water_pieces:
+            pos = self.tile_rect(cell).topleft
+            self.water_pieces[cell] = self.background.add(self.water_surf, pos, LAYERS['soil water'])
 
-                pos = soil_sprite.rect.topleft
-                surf = self.water_surf
-                WaterTile(pos, surf, [self.all_sprites, self.water_sprites])
+    def create_soil_grid(self, map_path):
+        map_data = load_map(map_path)
 
+        # one byte of flags per map tile
+        self.grid = np.zeros((map_data.height, map_data.width), np.uint8)
+        self.grid[map_data.layers['Farmable'] != 0] |= FARMABLE
+
+    # (row, col) of the tile under pos, None off the map
+    def cell(self, pos):
+        x = int(pos[0] // TILE_SIZE)
+        y = int(pos[1] // TILE_SIZE)
+        rows, cols = self.grid.shape
+        if 0 <= x < cols and 0 <= y < rows:
+            return y, x
+
+    def tile_rect(self, cell):
+        return pygame.Rect(cell[1] * TILE_SIZE, cell[0] * TILE_SIZE, TILE_SIZE, TILE_SIZE)
+
+    @profiler.timed('soil')
+    def get_hit(self, point):
+        cell = self.cell(point)
+        if cell and self.grid[cell] & FARMABLE:
+            audio.play('hoe')
+            self.grid[cell] |= TILLED
+            self.create_soil_tile(cell)
+            if self.raining:
+                self.water_all()
+
+    @profiler.timed('soil')
+    def water(self, target_pos):
+        cell = self.cell(target_pos)
+        if cell and self.grid[cell] & TILLED:
+            self.grid[cell] |= WATERED
+            self.create_water_tile(cell)
+
+    @profiler.timed('soil')
     def water_all(self):
-        for index_row, row in enumerate(self.grid):
-            for index_col, cell in enumerate(row):
-                if 'X' in cell and 'W' not in cell:
-                    cell.append('W')
-                    x = index_col * TILE_SIZE
-                    y = index_row * TILE_SIZE
-                    WaterTile(
-                    pos = (x,y),
-                    surf = self.water_surf,
-                    groups = [self.all_sprites, self.water_sprites])
+        dry = (self.grid & TILLED).astype(bool) & ~(self.grid & WATERED).astype(bool)
+        self.grid[dry] |= WATERED
+        for cell in map(tuple, np.argwhere(dry).tolist()):
+            self.create_water_tile(cell)
 
+    @profiler.timed('soil')
     def remove_water(self):
-        # destroy all water sprites
-        for sprite in self.water_sprites.sprites():
-            sprite.kill()
+        # only the wet tiles get repainted
+        for piece in self.water_pieces.values():
+            self.background.remove(piece)
+        self.water_pieces.clear()
 
         # clean up the grid
-        for row in self.grid:
-            for cell in row:
-                if 'W' in cell:
-                    cell.remove('W')
-
-    def check_watered(self, pos):
-        x = pos[0] // TILE_SIZE
-        y = pos[1] // TILE_SIZE
-        cell = self.grid[y][x]
-        is_watered = 'W' in cell
-        return is_watered
-
-    def plant_seed(self, target_pos, seed):
-        for soil_sprite in self.soil_sprites.sprites():
-            if soil_sprite.rect.collidepoint(target_pos):
-                self.plant_sound.play()
+        self.grid &= ~WATERED
 
-                x = soil_sprite.rect.x // TILE_SIZE
-                y = soil_sprite.rect.y // TILE_SIZE
+    def tilled_count(self):
+        return int(np.count_nonzero(self.grid & TILLED))
 
-                if 'P' not in self.grid[y][x]:
-                    self.grid[y][x].append('P')
-                    Plant(seed, [self.all_sprites, self.plant_sprites, self.collision_sprites],soil_sprite, self.check_watered)
-
-    def update_plants(self):
-        for plant in self.plant_sprites.sprites():
-            plant.grow()
+    @profiler.timed('soil')
+    def plant_seed(self, target_pos, seed):
+        cell = self.cell(target_pos)
+        if cell and self.grid[cell] & TILLED:
+            audio.play('plant')
+
+            if not self.grid[cell] & PLANTED:
+                self.create_plant(cell, seed)
+
+    def create_plant(self, cell, crop_type, age=0):
+        index = self.crops.add(cell, crop_type, age)
+        groups = [self.all_sprites, self.plant_sprites, self.collision_sprites]
+        plant = Plant(self.crops, index, groups, self.tile_rect(cell), self.crop_frames[crop_type])
+        self.plants[index] = self.plant_cells[cell] = plant
+        self.grid[cell] |= PLANTED
+        if plant.harvestable:
+            self.grid[cell] |= RIPE
+
+    def remove_plant(self, plant):
+        self.grid[plant.cell] &= ~(PLANTED | RIPE)
+        self.crops.remove(plant.index)
+        del self.plants[plant.index]
+        del self.plant_cells[plant.cell]
+
+    # ripe plants whose tile lies under rect or just below it
+    def ripe_plants(self, rect):
+        area = pygame.Rect(rect.left, rect.top, rect.width, rect.height + self.plant_reach)
+        rows, cols = self.grid.shape
+        ripe = []
+        for col, row in grid_range(area, TILE_SIZE):
+            if 0 <= row < rows and 0 <= col < cols and self.grid[row, col] & RIPE:
+                ripe.append(self.plant_cells[(row, col)])
+        return ripe
+
+    # grid and crop columns, copied so a save can encode them off the main thread
+    def snapshot(self):
+        live = self.crops.live()
+        return {
+            'grid': self.grid.copy(),
+            'crop_types': list(self.crops.crop_types),
+            'plant_cells': np.column_stack((self.crops.row[live], self.crops.col[live])),
+            'plant_types': self.crops.kind[live],
+            'plant_ages': self.crops.age[live],
+        }
+
+    # rebuilds tiles and plants from a snapshot, on a freshly set up layer
+    def restore(self, state):
+        # crop bits come back only for the plants recreated below, so a dropped crop type or
+        # a crop that gained growth stages since the save cannot leave a stale PLANTED or RIPE
+        self.grid[:] = state['grid'] & ~(PLANTED | RIPE)
+        for cell in map(tuple, np.argwhere(self.grid & TILLED).tolist()):
+            self.create_soil_tile(cell)
+        for cell in map(tuple, np.argwhere(self.grid & WATERED).tolist()):
+            self.create_water_tile(cell)
+
+        crop_types = state['crop_types']
+        for cell, kind, age in zip(state['plant_cells'].tolist(), state['plant_types'].tolist(), state['plant_ages'].tolist()):
+            # crops this build has no frames for are dropped
+            if crop_types[kind] in self.crop_frames:
+                self.create_plant(tuple(cell), crop_types[kind], age)
+
+    # grows every crop on a watered tile by days, redrawing only the ones that reached a new stage
+    @profiler.timed('soil')
+    def update_plants(self, days=1):
+        watered = (self.grid & WATERED).astype(bool)
+        for index in self.crops.advance(watered, days).tolist():
+            plant = self.plants[index]
+            plant.refresh()
+            if plant.harvestable:
+                self.grid[plant.cell] |= RIPE
+            self.all_sprites.mark_dirty(plant)
+            self.collision_sprites.refresh(plant)
@@ -0,0 +1,89 @@
+import pygame
+from settings import *
+from support import grid_range
+
+class CollisionGroup(pygame.sprite.Group):
+    def __init__(self, cell_size=TILE_SIZE):
+        super().__init__()
+        self.cell_size = cell_size
+
+        # uniform grid of hitbox owners, keyed by (col, row)
+        self.cells = {}
+        self.sprite_cells = {}
+
+        # plain rects for static geometry, in the same grid but with no sprite behind them
+        self.static_cells = {}
+
+        # sprites join groups before their hitbox is set, so index them on the next query;
+        # a dict keeps insertion order with O(1) membership
+        self.pending = {}
+
+        # refilled by every query instead of building a new list
+        self.found = []
+
+    def add_internal(self, sprite, layer=None):
+        super().add_internal(sprite)
+        self.pending[sprite] = None
+
+    def remove_internal(self, sprite):
+        super().remove_internal(sprite)
+        if sprite in self.sprite_cells:
+            self.unindex(sprite)
+        else:
+            self.pending.pop(sprite, None)
+
+    def index(self, sprite):
+        keys = list(grid_range(sprite.hitbox, self.cell_size))
+        for key in keys:
+            self.cells.setdefault(key, []).append(sprite)
+        self.sprite_cells[sprite] = keys
+
+    def unindex(self, sprite):
+        for key in self.sprite_cells.pop(sprite):
+            cell = self.cells[key]
+            cell.remove(sprite)
+            if not cell:
+                del self.cells[key]
+
+    def add_rects(self, rects):
+        for rect in rects:
+            for key in grid_range(rect, self.cell_size):
+                self.static_cells.setdefault(key, []).append(rect)
+
+    # call after a sprite gained or replaced its hitbox
+    def refresh(self, sprite):
+        if sprite in self.sprite_cells:
+            self.unindex(sprite)
+            self.index(sprite)
+        elif sprite in self.spritedict:
+            self.pending[sprite] = None
+
+    def flush(self):
+        for sprite in self.pending:
+            # sprites without a hitbox (seedlings) wait for a refresh
+            if hasattr(sprite, 'hitbox'):
+                self.index(sprite)
+        self.pending.clear()
+
+    # hitboxes sharing a cell with rect; the list is reused, so read it before the next query
+    def query(self, rect):
+        if self.pending:
+            self.flush()
+
+        found = self.found
+        found.clear()
+        cells = self.cells
+        static_cells = self.static_cells
+        for key in grid_range(rect, self.cell_size):
+            # rects spanning several cells are listed once; only a handful are ever nearby
+            cell = cells.get(key)
+            if cell:
+                for sprite in cell:
+                    if sprite.hitbox not in found:
+                        found.append(sprite.hitbox)
+            cell = static_cells.get(key)
+            if cell:
+                for static in cell:
+                    if static not in found:
+                        found.append(static)
+        return found
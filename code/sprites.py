@@ -1,6 +1,6 @@
 import pygame
 from settings import *
-from random import randint, choice
+from timer import scheduler
 
 class Generic(pygame.sprite.Sprite):
     def __init__(self, pos, surf, groups, z=LAYERS['main']):
@@ -16,29 +16,6 @@ class Interaction(Generic):
         super().__init__(pos,surf,groups)
         self.name = name
 
-class Water(Generic):
-    def __init__(self, pos, frames, groups):
-        # animation setup
-        self.frames = frames
-        self.frame_index = 0
-
-        # sprite setup
-        super().__init__(
-            pos=pos,
-            surf=self.frames[self.frame_index],
-            groups=groups,
-            z=LAYERS['water'])
-
-    def animate(self, dt):
-        self.frame_index += 5 * dt
-        if self.frame_index >= len(self.frames):
-            self.frame_index = 0
-
-        self.image = self.frames[int(self.frame_index)]
-
-    def update(self, dt):
-        self.animate(dt)
-
 class WildFlower(Generic):
     def __init__(self, pos, surf, groups):
         super().__init__(pos, surf, groups)
@@ -47,8 +24,6 @@ class WildFlower(Generic):
 class Particle(Generic):
     def __init__(self, pos, surf, groups, z, duration = 200):
         super().__init__(pos,surf,groups,z)
-        self.start_time = pygame.time.get_ticks()
-        self.duration = duration
 
         # white surface
         mask_surf = pygame.mask.from_surface(self.image)
@@ -56,7 +31,5 @@ class Particle(Generic):
         new_surf.set_colorkey((0,0,0))
         self.image = new_surf
 
-    def update(self,dt):
-        current_time = pygame.time.get_ticks()
-        if current_time - self.start_time > self.duration:
-            self.kill()
+        # gone once more than duration has passed
+        scheduler.schedule(duration + 1, self.kill)
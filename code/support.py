@@ -1,18 +1,11 @@
-from os import walk
-import pygame
+from assets import load_folder
 
 def import_folder(path):
-    surface_list = []
+    # decoded once and shared through the asset cache
+    return load_folder(path)
 
-    for _, _, img_files in walk(path):
-        # Sort img_files to ensure correct order
-        img_files.sort(reverse=True) 
-        for image in img_files:
-            full_path = path + '/' + image
-            try:
-                image_surf = pygame.image.load(full_path).convert_alpha()
-                surface_list.append(image_surf)
-            except pygame.error as e:
-                print(f"Error loading image '{full_path}': {e}")
-
-    return surface_list
+# (col, row) keys of the size x size grid cells a rect overlaps
+def grid_range(rect, size):
+    for col in range(rect.left // size, (rect.right - 1) // size + 1):
+        for row in range(rect.top // size, (rect.bottom - 1) // size + 1):
+            yield col, row
@@ -1,24 +1,81 @@
-import pygame
+import clock
+from heapq import heappush, heappop, heapify
+from itertools import count
+
+class Scheduler:
+    def __init__(self):
+        # [due, serial, callback] entries ordered by due time; the serial keeps ties in scheduling order
+        self.queue = []
+        self.serial = count()
+
+        # cancelled entries stay queued with no callback until they surface or the queue is compacted
+        self.cancelled = 0
+
+    # calls callback once delay milliseconds have passed; returns the entry to cancel it by
+    def schedule(self, delay, callback):
+        entry = [clock.get_ticks() + delay, next(self.serial), callback]
+        heappush(self.queue, entry)
+        return entry
+
+    def cancel(self, entry):
+        if entry[2] is not None:
+            entry[2] = None
+            self.cancelled += 1
+            # past half the queue, dropping them is cheaper than popping them one by one later
+            if self.cancelled > 64 and self.cancelled * 2 > len(self.queue):
+                # in place, since update() may be walking this very list when a callback cancels
+                self.queue[:] = [entry for entry in self.queue if entry[2] is not None]
+                heapify(self.queue)
+                self.cancelled = 0
+
+    def reschedule(self, entry, delay):
+        callback = entry[2]
+        self.cancel(entry)
+        return self.schedule(delay, callback)
+
+    # forgets everything, for when the clock it was scheduled against is replaced
+    def clear(self):
+        self.queue.clear()
+        self.cancelled = 0
+
+    # reads the clock once and fires only what came due, earliest first
+    def update(self):
+        now = clock.get_ticks()
+        queue = self.queue
+        while queue and queue[0][0] <= now:
+            entry = heappop(queue)
+            callback = entry[2]
+            if callback is None:
+                self.cancelled -= 1
+            else:
+                entry[2] = None
+                callback()
+
+scheduler = Scheduler()
 
 class Timer:
     def __init__(self, duration, func=None):
         self.duration = duration
         self.func = func
-        self.start_time = 0
-        self.active = False
+        self.entry = None
 
-    def activate(self):
-        self.active = True
-        self.start_time = pygame.time.get_ticks()
+    @property
+    def active(self):
+        return self.entry is not None
 
+    # starting an active timer again restarts its duration
+    def activate(self):
+        if self.entry is None:
+            self.entry = scheduler.schedule(self.duration, self.expire)
+        else:
+            self.entry = scheduler.reschedule(self.entry, self.duration)
 
     def deactivate(self):
-        self.active = False
-        self.start_time = 0
+        if self.entry is not None:
+            scheduler.cancel(self.entry)
+            self.entry = None
 
-    def update(self):
-        current_time = pygame.time.get_ticks()
-        if current_time - self.start_time >= self.duration:
-            if self.func and self.start_time != 0:
-                self.func()
-            self.deactivate()
+    def expire(self):
+        self.entry = None
+        if self.func:
+            self.func()
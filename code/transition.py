@@ -1,19 +1,16 @@
-import pygame
 from settings import *
 
 class Transition:
     def __init__(self, reset, player):
         # Setup
-        self.display_surface = pygame.display.get_surface()
         self.reset = reset
         self.player = player
 
-        # Overlay image
-        self.image = pygame.Surface((SCREEN_WIDTH, SCREEN_HEIGHT))
+        # fade level, drawn by Lighting
         self.color = 255
         self.speed = -2
 
-    def play(self):
+    def update(self):
         self.color += self.speed
         if self.color <= 0:
             self.speed *= -1
@@ -24,5 +21,6 @@ class Transition:
             self.player.sleep = False
             self.speed = -2
 
-        self.image.fill((self.color,self.color,self.color))
-        self.display_surface.blit(self.image, (0, 0), special_flags = pygame.BLEND_RGB_MULT)
\ No newline at end of file
+    @property
+    def tint(self):
+        return (self.color, self.color, self.color)
\ No newline at end of file
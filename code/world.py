@@ -0,0 +1,92 @@
+import pygame
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from settings import *
+from sprites import WildFlower
+from support import grid_range
+from assets import load_image, split_image
+
+class WorldStreamer:
+    # instantiates map chunks near the player and evicts the least recently used ones;
+    # farm state lives in SoilLayer and is never evicted
+    def __init__(self, map_data, background, all_sprites, collision_sprites, ground_path=GROUND_PATH,
+                 chunk_size=CHUNK_SIZE, margin=STREAM_MARGIN, max_chunks=STREAM_MAX_CHUNKS):
+        self.background = background
+        self.all_sprites = all_sprites
+        self.collision_sprites = collision_sprites
+        self.chunk_size = chunk_size
+        self.margin = margin
+        self.max_chunks = max_chunks
+        self.bounds = pygame.Rect(0, 0, map_data.width * TILE_SIZE, map_data.height * TILE_SIZE)
+
+        # the map split by chunk, as positions and image references rather than sprites
+        self.decorations = {}
+        for obj in map_data.objects['Decoration']:
+            self.decorations.setdefault(self.key((obj.x, obj.y)), []).append(((obj.x, obj.y), obj.image))
+
+        # ground tiles are decoded on a worker thread, a ring ahead of when they are needed
+        self.ground_tiles = split_image(ground_path, chunk_size) if ground_path else {}
+        self.loader = ThreadPoolExecutor(max_workers=1, thread_name_prefix='ground')
+        self.requests = {}
+
+        # key -> (sprites, ground piece), least recently needed first
+        self.loaded = OrderedDict()
+
+    def key(self, pos):
+        return int(pos[0] // self.chunk_size), int(pos[1] // self.chunk_size)
+
+    # chunk keys on the map within margin chunks of a view centred on center
+    def keys(self, center, margin):
+        area = pygame.Rect(0, 0, SCREEN_WIDTH, SCREEN_HEIGHT).inflate(2 * margin * self.chunk_size, 2 * margin * self.chunk_size)
+        area.center = center
+        area = area.clip(self.bounds)
+        return set(grid_range(area, self.chunk_size)) if area.width and area.height else set()
+
+    def request(self, key):
+        if key in self.ground_tiles and key not in self.requests and key not in self.loaded:
+            self.requests[key] = self.loader.submit(pygame.image.load, self.ground_tiles[key])
+
+    # a tile image from the map, shared through the asset cache
+    def image(self, ref):
+        path, area = ref
+        image = load_image(path)
+        return image.subsurface(area) if area else image
+
+    def load(self, key):
+        sprites = [WildFlower(pos, self.image(ref), [self.all_sprites, self.collision_sprites]) for pos, ref in self.decorations.get(key, ())]
+
+        piece = None
+        if key in self.ground_tiles:
+            self.request(key)
+            surf = self.requests.pop(key).result().convert_alpha()
+            piece = self.background.add(surf, (key[0] * self.chunk_size, key[1] * self.chunk_size), LAYERS['ground'])
+        self.loaded[key] = (sprites, piece)
+
+    def evict(self, key):
+        sprites, piece = self.loaded.pop(key)
+        for sprite in sprites:
+            sprite.kill()
+        if piece:
+            self.background.remove(piece)
+
+    def update(self, center):
+        # everything the view could reach before the next update is loaded
+        active = self.keys(center, self.margin)
+        for key in active:
+            if key in self.loaded:
+                self.loaded.move_to_end(key)
+            else:
+                self.load(key)
+
+        # prefetch one ring further out, forgetting requests the player has turned away from
+        ring = self.keys(center, self.margin + 1)
+        for key in ring:
+            self.request(key)
+        for key in [key for key in self.requests if key not in ring]:
+            self.requests.pop(key).cancel()
+
+        while len(self.loaded) > self.max_chunks:
+            key = next(iter(self.loaded))
+            if key in active:
+                break
+            self.evict(key)